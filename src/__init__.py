@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules of src import each other by bare names (from theorem import Theorem)
+# so that they run as scripts from inside src; make that work from anywhere.
+_here = os.path.dirname(os.path.abspath(__file__))
+if _here not in sys.path:
+    sys.path.insert(0, _here)
@@ -0,0 +1,239 @@
+"""Command line interface, run as python -m src <command> from the repository.
+
+Every command prints one JSON object per line. Modules are imported inside
+the commands, so that e.g. theorem values never load networkx or matplotlib;
+python -m src budget checks this and the import time of the light commands."""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Imports which must not happen for commands not working with graphs.
+HEAVY = ("networkx", "matplotlib", "scipy")
+
+def span(text : str) -> range:
+    """Inclusive range given as "5" or "5:20"."""
+    first, _, last = text.partition(":")
+    return range(int(first), int(last or first) + 1)
+
+def emit(record : Dict) -> None:
+    print(json.dumps(record), flush=True)
+
+def theorem(args) -> None:
+    import numpy as np
+    from theorem import BatchTheorem
+    n = np.array(args.n, dtype=np.int64)
+    k, ties = BatchTheorem.gamma(n)
+    cM2 = BatchTheorem.f(n, k)
+    v = BatchTheorem.cyclomatic_number_of(n, k)
+    for i in range(len(n)):
+        gamma = [int(k[i]), int(k[i]) + 1] if ties[i] else [int(k[i])]
+        emit({"n": int(n[i]), "gamma": gamma, "v": int(v[i]), "cM2": int(cM2[i])})
+
+def conjecture(args) -> None:
+    from conjecture import Base, Conjecture
+    which = getattr(Conjecture(args.time_budget), args.type)
+    for n in args.n:
+        for v in args.v:
+            if Base.graph_exists(n, v):
+                try:
+                    cM2 = int(which.cM2(n, v))
+                except ValueError: # exact search out of time budget
+                    cM2 = None
+                emit({"type": args.type, "n": n, "v": v, "cM2": cM2})
+
+def sa(args) -> None:
+    import numpy as np
+    from simulated_annealing import (
+        SA, FunctionsMin, FunctionsMax, SparseFunctionsMin, SparseFunctionsMax,
+        random_connected_graph,
+    )
+    from schedules import Geometric, Adaptive, Reheating, stopping_rules
+    from state_cache import StateCache
+    from catalog import Catalog
+    from continuation import warm_start
+    from conjecture import Base
+    schedules = {"geometric": Geometric, "adaptive": Adaptive, "reheating": Reheating}
+    optima = {}
+    for n in args.n:
+        for v in args.v:
+            if not Base.graph_exists(n, v):
+                continue
+            rng = np.random.default_rng([args.seed, n, v])
+            if args.batch:
+                sparse = SparseFunctionsMin if args.type == 'min' else SparseFunctionsMax
+                functions = sparse(args.batch, args.local)
+            elif args.shards:
+                from shared_scoring import SharedFunctionsMin, SharedFunctionsMax
+                shared = SharedFunctionsMin if args.type == 'min' else SharedFunctionsMax
+                functions = shared(args.shards)
+            else:
+                functions = FunctionsMin() if args.type == 'min' else FunctionsMax()
+            start = time.perf_counter()
+            cache = StateCache(args.cache) if args.cache else None
+            T = args.T
+            if args.warm and optima:
+                G, origin = warm_start(n, v, args.type, optima, rng)
+                if origin != "random":
+                    T = args.T_warm
+            else:
+                G, origin = random_connected_graph(n, v, rng), "random"
+            sa = SA(functions, G, args.type, T, args.u, seed=rng, cache=cache)
+            stopping = stopping_rules(args.type, n, v, args.target, args.seconds, args.stall)
+            stopped = sa.anneal(schedules[args.schedule](), stopping)
+            if args.shards:
+                functions.close()
+            record = {
+                "type": args.type, "n": n, "v": v, "E": int(sa.best_E),
+                "edges": sa.best_edges.tolist(), "seconds": time.perf_counter() - start,
+                "steps": sa.steps, "stopped": stopped, "start": origin,
+            }
+            optima[n, v] = sa.best_edges
+            if cache is not None:
+                record["cache"] = cache.summary()
+            if args.catalog is not None:
+                with Catalog(args.catalog) as c:
+                    record["catalog"] = c.record(
+                        args.type, n, v, sa.best_E, sa.best_edges, "sa",
+                        [args.seed, n, v], record["seconds"],
+                    )
+            emit(record)
+
+def catalog(args) -> None:
+    from catalog import Catalog
+    ns = (args.n.start, args.n.stop - 1) if args.n else None
+    vs = (args.v.start, args.v.stop - 1) if args.v else None
+    with Catalog(args.db) as c:
+        if args.sweep:
+            emit({"sweep": args.sweep, **c.load_sweep(args.sweep)})
+        if args.latex:
+            emit({"type": args.type, "latex": c.latex_table(args.type, ns, vs)})
+            return
+        for record in c.query(args.type, ns, vs):
+            if args.optima:
+                record["graphs"] = c.optima(args.type, record["n"], record["v"])
+            emit(record)
+
+def cm2(args) -> None:
+    from batch_cm2 import BatchCM2
+    evaluator = BatchCM2(args.keep, args.v, args.workers, int(args.chunk * 2**20))
+    result = evaluator.run_path(args.input)
+    for which in ('min', 'max'):
+        for record in result.pop(which):
+            emit({"which": which, **record})
+    emit(result)
+
+def render(args) -> None:
+    from render import Renderer, conjecture_items
+    os.makedirs(args.directory, exist_ok=True)
+    style = {"format": args.format}
+    if args.layout:
+        style["layout"] = args.layout
+    elif args.type == 'max':
+        style["layout"] = "circular" # as Max.save_graph
+    renderer = Renderer(workers=args.workers, **style)
+    items = conjecture_items(args.type, args.n, args.v, args.directory, args.format)
+    emit({"type": args.type, "directory": args.directory, **renderer.render(items)})
+
+def budget(args) -> None:
+    """Imports the light commands in a fresh interpreter and checks time and
+    modules loaded. Exits with status 1 if the budget is exceeded."""
+    code = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        "import src.__main__, theorem, conjecture\n"
+        "t = time.perf_counter() - t\n"
+        f"print(json.dumps([t, [m for m in {HEAVY!r} if m in sys.modules]]))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    seconds = []
+    for _ in range(args.repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True,
+        )
+        t, heavy = json.loads(out.stdout)
+        seconds.append(t)
+    ok = min(seconds) <= args.seconds and not heavy
+    emit({"seconds": min(seconds), "budget": args.seconds, "heavy": heavy, "ok": ok})
+    if not ok:
+        sys.exit(1)
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m src", description=__doc__.splitlines()[0])
+    commands = p.add_subparsers(dest="command", required=True)
+
+    c = commands.add_parser("theorem", help="optimal k, v and cM2 of maximal graphs by Theorem")
+    c.add_argument("--n", type=span, required=True, help='order(s), e.g. "5:100"')
+    c.set_defaults(run=theorem)
+
+    c = commands.add_parser("conjecture", help="cM2 values of Conjecture")
+    c.add_argument("--type", choices=("min", "max"), default="min")
+    c.add_argument("--n", type=span, required=True)
+    c.add_argument("--v", type=span, required=True)
+    c.add_argument("--time-budget", type=float, default=1.0, help="seconds of exact search for min with n < 2v - 1")
+    c.set_defaults(run=conjecture)
+
+    c = commands.add_parser("sa", help="simulated annealing runs")
+    c.add_argument("--type", choices=("min", "max"), default="min")
+    c.add_argument("--n", type=span, required=True)
+    c.add_argument("--v", type=span, required=True)
+    c.add_argument("--T", type=float, default=1000.0)
+    c.add_argument("--u", type=float, default=0.995)
+    c.add_argument("--seed", type=int, default=0)
+    c.add_argument("--schedule", choices=("geometric", "adaptive", "reheating"), default="geometric")
+    c.add_argument("--target", action="store_true", help="stop at the value of Conjecture")
+    c.add_argument("--seconds", type=float, help="wall clock budget per chain")
+    c.add_argument("--stall", type=int, help="stop after this many steps without improvement")
+    c.add_argument("--cache", type=int, help="size of the isomorphism-aware cache of move scores")
+    c.add_argument("--catalog", help="record results in this catalog file")
+    c.add_argument("--warm", action="store_true", help="start from results for (n - 1, v) and (n, v - 1)")
+    c.add_argument("--T-warm", type=float, default=10.0, help="initial temperature of warm starts")
+    c.add_argument("--batch", type=int, help="sample this many swaps per step instead of scoring all (large sparse graphs)")
+    c.add_argument("--shards", type=int, help="score the swaps of a chain on this many worker processes")
+    c.add_argument("--local", type=float, default=0.5, help="share of sampled swaps rewiring an edge to distance two")
+    c.set_defaults(run=sa)
+
+    c = commands.add_parser("catalog", help="best known graphs stored in a catalog")
+    c.add_argument("--db", default="catalog.sqlite")
+    c.add_argument("--type", choices=("min", "max"), default="min")
+    c.add_argument("--n", type=span)
+    c.add_argument("--v", type=span)
+    c.add_argument("--optima", action="store_true", help="include graph6 and provenance of all optima")
+    c.add_argument("--latex", action="store_true", help="table as LaTeX, as Conjecture.latex_table")
+    c.add_argument("--sweep", help="first record results of this sweep directory")
+    c.set_defaults(run=catalog)
+
+    c = commands.add_parser("cm2", help="cM2 of every graph of a graph6/sparse6 file")
+    c.add_argument("input", nargs="?", default="-", help="file, standard input if - or missing")
+    c.add_argument("--keep", type=int, default=10, help="graphs of smallest and largest cM2 to print")
+    c.add_argument("--v", type=span, help="only graphs with these cyclomatic numbers")
+    c.add_argument("--workers", type=int, default=1)
+    c.add_argument("--chunk", type=float, default=4.0, help="megabytes per block")
+    c.set_defaults(run=cm2)
+
+    c = commands.add_parser("render", help="images of Conjecture graphs")
+    c.add_argument("--type", choices=("min", "max"), default="min")
+    c.add_argument("--n", type=span, required=True)
+    c.add_argument("--v", type=span, required=True)
+    c.add_argument("--directory", default="optimal-graphs")
+    c.add_argument("--format", choices=("png", "svg"), default="png")
+    c.add_argument("--layout", choices=("spring", "circular"))
+    c.add_argument("--workers", type=int)
+    c.set_defaults(run=render)
+
+    c = commands.add_parser("budget", help="check import time of light commands")
+    c.add_argument("--seconds", type=float, default=0.5)
+    c.add_argument("--repeat", type=int, default=3)
+    c.set_defaults(run=budget)
+    return p
+
+def main(argv : Optional[List[str]] = None) -> None:
+    args = parser().parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
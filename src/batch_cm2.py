@@ -0,0 +1,206 @@
+import os
+import sys
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import (
+    Optional, Dict, List, Tuple, Iterator, Iterable, IO,
+)
+import graph6
+
+def _order(line : bytes) -> int:
+    data = line[10:] if line.startswith(b">>graph6<<") else line
+    if data.startswith(b">>sparse6<<"):
+        data = data[11:]
+    if data.startswith(b":"):
+        data = data[1:]
+    return graph6._read_size(data)[0]
+
+def pad(n : int, edge_lists : List[np.ndarray]) -> np.ndarray:
+    """Edge arrays of graphs on n vertices as one array of shape (B, M, 2),
+    padded with pairs (n, n)."""
+    M = max((len(edges) for edges in edge_lists), default=0)
+    batch = np.full((len(edge_lists), M, 2), n, dtype=np.int64)
+    for b, edges in enumerate(edge_lists):
+        batch[b, :len(edges)] = edges
+    return batch
+
+def decode(lines : List[bytes]) -> Iterator[Tuple[np.ndarray, int, np.ndarray]]:
+    """Groups graph6 and sparse6 lines by order n and yields, for every group,
+    indices of its lines, n and padded edges (see pad). Lines of graph6 are
+    decoded by graph6.decode_many, all lines of an order at once."""
+    groups : Dict[Tuple[int, bool], List[int]] = {}
+    for i, line in enumerate(lines):
+        sparse = line.startswith((b":", b">>sparse6<<"))
+        groups.setdefault((_order(line), sparse), []).append(i)
+    for (n, sparse), where in groups.items():
+        if sparse:
+            batch = pad(n, [graph6.decode_sparse6(lines[i])[1] for i in where])
+        else:
+            group = [lines[i][10:] if lines[i].startswith(b">>graph6<<") else lines[i] for i in where]
+            batch = graph6.decode_many(group, n)
+        yield np.array(where, dtype=np.int64), n, batch
+
+def evaluate(n : int, batch : np.ndarray) -> Dict[str, np.ndarray]:
+    """cM2 and degree statistics of a padded batch (B, M, 2) of graphs on n
+    vertices, as in enumeration.CM2Reducer.cM2. Pairs (n, n) count as a
+    vertex of degree 0 and contribute nothing. v is m - n + 1, the
+    cyclomatic number if the graph is connected."""
+    B = len(batch)
+    offset = (np.arange(B) * (n + 1))[:, None, None]
+    degree = np.bincount((batch + offset).ravel(), minlength=B * (n + 1)).reshape(B, n + 1)
+    degree[:, n] = 0
+    d = np.take_along_axis(degree, batch.reshape(B, -1), axis=1).reshape(batch.shape)
+    m = (batch[:, :, 0] < n).sum(axis=1)
+    degree = degree[:, :n]
+    return {
+        "n": np.full(B, n), "m": m, "v": m - n + 1,
+        "cM2": np.abs(d[:, :, 0]**2 - d[:, :, 1]**2).sum(axis=1),
+        "min_degree": degree.min(axis=1, initial=n),
+        "max_degree": degree.max(axis=1, initial=0),
+        "M1": (degree**2).sum(axis=1),
+    }
+
+class TopK:
+    """The keep graphs of smallest and of largest cM2 seen so far, earlier
+    graphs first among ties. Graphs are records of evaluate with their line."""
+    def __init__(self, keep : int = 10):
+        self.keep = keep
+        self.values = {'min': np.zeros(0, dtype=np.int64), 'max': np.zeros(0, dtype=np.int64)}
+        self.records : Dict[str, List[Dict]] = {'min': [], 'max': []}
+
+    def _add(self, which : str, values : np.ndarray, records : List[Dict]) -> None:
+        sign = 1 if which == 'min' else -1
+        values = np.concatenate((self.values[which], values))
+        records = self.records[which] + records
+        order = np.argsort(sign * values, kind='stable')[:self.keep]
+        self.values[which] = values[order]
+        self.records[which] = [records[i] for i in order]
+
+    def feed(self, lines : List[bytes], stats : Dict[str, np.ndarray]) -> None:
+        """Lines in order of reading and the arrays of evaluate for them."""
+        values = stats["cM2"]
+        for which, sign in (('min', 1), ('max', -1)):
+            best = np.argsort(sign * values, kind='stable')[:self.keep]
+            records = [
+                {"graph6": lines[i].decode("ascii"), **{k: int(a[i]) for k, a in stats.items()}}
+                for i in best.tolist()
+            ]
+            self._add(which, values[best], records)
+
+    def merge(self, other : "TopK") -> None:
+        """Adds graphs of other, which were read after those of self."""
+        for which in ('min', 'max'):
+            self._add(which, other.values[which], other.records[which])
+
+def evaluate_lines(lines : List[bytes], vs : Optional[Iterable[int]] = None) -> Dict[str, np.ndarray]:
+    """Arrays of evaluate for lines in order, only graphs with cyclomatic
+    number in vs (all if None), with their index in lines as "line"."""
+    lines = [line for line in lines if line.strip()]
+    stats : Dict[str, np.ndarray] = {}
+    if not lines:
+        return stats
+    for where, n, batch in decode(lines):
+        for key, values in evaluate(n, batch).items():
+            stats.setdefault(key, np.zeros(len(lines), dtype=np.int64))[where] = values
+    stats["line"] = np.arange(len(lines))
+    if vs is not None:
+        keep = np.isin(stats["v"], list(vs))
+        stats = {key: values[keep] for key, values in stats.items()}
+    return stats
+
+def _chunk(args) -> Tuple[TopK, Dict[str, int]]:
+    """Evaluates one block of lines, returns its TopK and counts."""
+    block, keep, vs = args
+    lines = [line.strip() for line in block.split(b"\n") if line.strip()]
+    stats = evaluate_lines(lines, vs)
+    top = TopK(keep)
+    counts = {"graphs": len(lines), "matched": 0}
+    if stats:
+        counts["matched"] = len(stats["line"])
+        top.feed([lines[i] for i in stats.pop("line").tolist()], stats)
+    return top, counts
+
+def blocks(f : IO[bytes], size : int = 1 << 22) -> Iterator[bytes]:
+    """Blocks of about size bytes of a binary stream, ending at line ends."""
+    while True:
+        block = f.read(size)
+        if not block:
+            return
+        yield block + f.readline()
+
+class BatchCM2:
+    """cM2 of every graph of a graph6/sparse6 stream, in blocks of about
+    chunk bytes each decoded and evaluated by a few vectorized calls.
+
+    Keeps the keep graphs of smallest and largest cM2 (see TopK), of those
+    with cyclomatic number in vs if given. With workers other than 1, blocks
+    are evaluated on a process pool, at most two per worker in flight, and
+    merged in order of reading, so results do not depend on workers."""
+    def __init__(
+            self,
+            keep : int = 10,
+            vs : Optional[Iterable[int]] = None,
+            workers : Optional[int] = 1,
+            chunk : int = 1 << 22,
+    ):
+        self.keep = keep
+        self.vs = None if vs is None else list(vs)
+        self.workers = workers
+        self.chunk = chunk
+
+    def run(self, f : IO[bytes]) -> Dict:
+        """Evaluates the stream f. Returns counts, the kept graphs and the
+        throughput in graphs and megabytes per second."""
+        start = perf_counter()
+        top, counts = TopK(self.keep), {"graphs": 0, "matched": 0, "bytes": 0}
+        def add(result):
+            top.merge(result[0])
+            for key, value in result[1].items():
+                counts[key] += value
+        jobs = ((block, self.keep, self.vs) for block in blocks(f, self.chunk))
+        if self.workers == 1:
+            for job in jobs:
+                counts["bytes"] += len(job[0])
+                add(_chunk(job))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                pending = deque()
+                limit = 2 * (self.workers or os.cpu_count() or 1)
+                for job in jobs:
+                    counts["bytes"] += len(job[0])
+                    pending.append(pool.submit(_chunk, job))
+                    if len(pending) >= limit:
+                        add(pending.popleft().result())
+                while pending:
+                    add(pending.popleft().result())
+        seconds = perf_counter() - start
+        return {
+            **counts, "min": top.records['min'], "max": top.records['max'],
+            "seconds": seconds,
+            "graphs_per_second": counts["graphs"] / seconds if seconds else None,
+            "MB_per_second": counts["bytes"] / 1e6 / seconds if seconds else None,
+        }
+
+    def run_path(self, path : Optional[str] = None) -> Dict:
+        """run on a file, or on standard input if path is None or "-"."""
+        if path in (None, "-"):
+            return self.run(sys.stdin.buffer)
+        with open(path, "rb") as f:
+            return self.run(f)
+
+
+if __name__ == "__main__":
+    import io
+    from enumeration import ConnectedGraphs
+    n, v = 8, 4
+    data = "".join(graph6.encode(n, edges) + "\n" for edges in ConnectedGraphs(n, n - 1 + v)).encode()
+    data = data * 50
+    for workers in (1, 2):
+        result = BatchCM2(keep=3, workers=workers, chunk=1 << 18).run(io.BytesIO(data))
+        print(
+            f"workers {workers}: {result['graphs']} graphs, "
+            f"{result['graphs_per_second']:.0f} graphs/s, {result['MB_per_second']:.1f} MB/s, "
+            f"min {result['min'][0]['cM2']}, max {result['max'][0]['cM2']}"
+        )
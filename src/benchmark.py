@@ -0,0 +1,175 @@
+"""Benchmarks of the hot paths, measured over growing sizes.
+
+    python benchmark.py run [--out baseline.json] [--only NAME ...]
+    python benchmark.py compare baseline.json [--threshold 0.25]
+
+run prints time per call and peak memory for every size, with the fitted
+complexity exponent (slope of log time against log size), and saves the
+results as JSON. compare runs the benchmarks again and exits with status 1
+if some benchmark became slower than the baseline by more than threshold
+(geometric mean of time ratios over the common sizes)."""
+import argparse
+import json
+import sys
+import tracemalloc
+import numpy as np
+from time import perf_counter
+from typing import (
+    Callable, Dict, List, Tuple,
+)
+
+def _annealer(n : int, v : int, seed : int = 0):
+    from simulated_annealing import SA, FunctionsMin, random_connected_graph
+    rng = np.random.default_rng(seed)
+    return SA(FunctionsMin(), random_connected_graph(n, v, rng), 'min', 100.0, 0.98, seed=seed)
+
+def _cM2(n : int) -> Callable:
+    from simulated_annealing import SA, random_connected_graph
+    G = random_connected_graph(n, n, np.random.default_rng(0))
+    return lambda: SA.cM2(G)
+
+def _new_state(n : int) -> Callable:
+    sa = _annealer(n, n // 2)
+    def run():
+        if sa.new_state() is not None:
+            sa.energy.rollback()
+    return run
+
+def _edge_to_remove(n : int) -> Callable:
+    sa = _annealer(n, n // 2)
+    state = sa.state
+    return lambda: sa.functions.edge_to_remove(sa, state.edges, state.non_edges())
+
+def _simulated_annealing(n : int) -> Callable:
+    return lambda: _annealer(n, n // 2).anneal()
+
+def _gamma(n : int) -> Callable:
+    from theorem import Theorem
+    theorem = Theorem()
+    return lambda: [theorem.gamma(k) for k in range(5, n)]
+
+def _batch_gamma(n : int) -> Callable:
+    from theorem import BatchTheorem
+    ns = np.arange(5, n)
+    return lambda: BatchTheorem.gamma(ns)
+
+def _find_a_b(n : int) -> Callable:
+    from conjecture import Max
+    vs = range(n - 1, (n - 1) * (n - 2) // 2 + 1)
+    def run():
+        Max.find_a_b.cache_clear()
+        return [Max().find_a_b(n, v) for v in vs]
+    return run
+
+def _min_G(n : int) -> Callable:
+    from conjecture import Min
+    return lambda: Min().G(n, n // 4)
+
+def _max_G(n : int) -> Callable:
+    from conjecture import Max
+    return lambda: Max().G(n, n)
+
+# name: (setup taking size and returning the measured call, sizes)
+BENCHMARKS : Dict[str, Tuple[Callable, List[int]]] = {
+    "SA.cM2": (_cM2, [50, 100, 200, 400]),
+    "SA.new_state": (_new_state, [20, 40, 80, 160]),
+    "FunctionsMin.edge_to_remove": (_edge_to_remove, [20, 40, 80, 160]),
+    "SA.simulated_annealing": (_simulated_annealing, [10, 20, 40]),
+    "Theorem.gamma": (_gamma, [250, 500, 1000, 2000]),
+    "BatchTheorem.gamma": (_batch_gamma, [10**4, 10**5, 10**6]),
+    "Max.find_a_b": (_find_a_b, [20, 40, 80, 160]),
+    "Min.G": (_min_G, [100, 1000, 10000]),
+    "Max.G": (_max_G, [20, 40, 80, 160]),
+}
+
+def measure(call : Callable, repeat : int = 5, min_time : float = 0.05) -> Tuple[float, int]:
+    """Best time per call over repeat rounds, each round calling often enough
+    to last min_time, and peak memory of one call in bytes (tracemalloc)."""
+    number, best = 1, float("inf")
+    while True:
+        start = perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = perf_counter()
+        for _ in range(number):
+            call()
+        best = min(best, (perf_counter() - start) / number)
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+def exponent(sizes : List[int], seconds : List[float]) -> float:
+    """Slope of log(seconds) against log(size)."""
+    return float(np.polyfit(np.log(sizes), np.log(seconds), 1)[0])
+
+def run(names : List[str], repeat : int = 5) -> Dict[str, Dict]:
+    results = {}
+    for name in names:
+        setup, sizes = BENCHMARKS[name]
+        seconds, peaks = [], []
+        for size in sizes:
+            t, peak = measure(setup(size), repeat)
+            seconds.append(t)
+            peaks.append(peak)
+            print(f"{name}\t{size}\t{t * 1e3:.4g} ms\t{peak / 2**20:.3g} MiB", flush=True)
+        results[name] = {
+            "sizes": sizes, "seconds": seconds, "peak_bytes": peaks,
+            "exponent": exponent(sizes, seconds),
+        }
+        print(f"{name}\texponent {results[name]['exponent']:.2f}", flush=True)
+    return results
+
+def compare(current : Dict[str, Dict], baseline : Dict[str, Dict], threshold : float) -> List[str]:
+    """Names of benchmarks slower than baseline by more than threshold."""
+    slower = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        old = dict(zip(baseline[name]["sizes"], baseline[name]["seconds"]))
+        ratios = [t / old[s] for s, t in zip(result["sizes"], result["seconds"]) if s in old]
+        if not ratios:
+            continue
+        ratio = float(np.exp(np.mean(np.log(ratios))))
+        print(f"{name}\t{ratio:.2f}x baseline")
+        if ratio > 1 + threshold:
+            slower.append(name)
+    return slower
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    c = commands.add_parser("run")
+    c.add_argument("--out", default="benchmark.json")
+    c.add_argument("--only", nargs="*", choices=list(BENCHMARKS))
+    c.add_argument("--repeat", type=int, default=5)
+    c = commands.add_parser("compare")
+    c.add_argument("baseline")
+    c.add_argument("--threshold", type=float, default=0.25)
+    c.add_argument("--only", nargs="*", choices=list(BENCHMARKS))
+    c.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(args.only or list(BENCHMARKS), args.repeat)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    names = [name for name in (args.only or list(BENCHMARKS)) if name in baseline]
+    slower = compare(run(names, args.repeat), baseline, args.threshold)
+    if slower:
+        print("slower than baseline: " + ", ".join(slower))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from typing import (
+    Optional, Dict, List, Tuple, TYPE_CHECKING,
+)
+import graph6
+from energy import better
+from graph_state import GraphState
+from state_cache import invariant_hash, isomorphism
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS best (
+    type TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    v INTEGER NOT NULL,
+    E INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (type, n, v)
+);
+CREATE TABLE IF NOT EXISTS graphs (
+    type TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    v INTEGER NOT NULL,
+    graph6 TEXT NOT NULL,
+    E INTEGER NOT NULL,
+    engine TEXT,
+    seed TEXT,
+    seconds REAL,
+    created REAL NOT NULL,
+    invariant TEXT,
+    PRIMARY KEY (type, n, v, graph6)
+);
+"""
+
+class Catalog:
+    """Best known graphs for every (type, n, v), kept in an SQLite file.
+
+    Table best holds the best energy of every key, table graphs all graphs
+    reaching it (ties), one per isomorphism class, as graph6 with provenance:
+    engine, seed, seconds and time of creation. Both tables are indexed by
+    (type, n, v), so point and range queries over n and v use the primary
+    keys.
+
+    Isomorphic graphs are recognised by state_cache.invariant_hash (degree
+    sequence and colour refinement), stored with every graph, and a map of
+    vertices is searched for only between graphs with equal invariants, so
+    no canonical labelling is ever computed.
+
+    record() is atomic: it takes the write lock of the database before
+    comparing with the stored energy, so many processes may write the same
+    file at once, and a worse graph never replaces a better one."""
+    def __init__(self, path : str = "catalog.sqlite", timeout : float = 60.0):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record(
+            self,
+            _type : str,
+            n : int,
+            v : int,
+            E : int,
+            edges,
+            engine : Optional[str] = None,
+            seed = None,
+            seconds : Optional[float] = None,
+    ) -> str:
+        """Stores a graph with energy E if it is at least as good as the best
+        known one. Returns "new" (first graph of the key), "improved", "tie"
+        (another optimum), "known" (isomorphic to a stored one) or "worse"."""
+        state = GraphState(n, np.asarray(edges, dtype=np.int64).reshape(-1, 2))
+        code, key = graph6.encode(n, state.edges), invariant_hash(state)
+        E, now = int(E), time.time()
+        seed = None if seed is None else str(seed)
+        c = self.connection
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            row = c.execute(
+                "SELECT E FROM best WHERE type = ? AND n = ? AND v = ?", (_type, n, v),
+            ).fetchone()
+            if row is not None and better(_type, row[0], E):
+                status = "worse"
+            else:
+                if row is None or row[0] != E:
+                    status = "new" if row is None else "improved"
+                    c.execute("DELETE FROM graphs WHERE type = ? AND n = ? AND v = ?", (_type, n, v))
+                    c.execute("INSERT OR REPLACE INTO best VALUES (?, ?, ?, ?, ?)", (_type, n, v, E, now))
+                known = row is not None and row[0] == E and self._known(_type, n, v, key, state)
+                if not known:
+                    c.execute(
+                        "INSERT OR IGNORE INTO graphs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (_type, n, v, code, E, engine, seed, seconds, now, key),
+                    )
+                if row is not None and row[0] == E:
+                    status = "known" if known else "tie"
+            c.execute("COMMIT")
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        return status
+
+    def _known(self, _type : str, n : int, v : int, key : str, state : GraphState) -> bool:
+        """Whether a stored graph of the key with invariant key is isomorphic to state."""
+        rows = self.connection.execute(
+            "SELECT graph6 FROM graphs WHERE type = ? AND n = ? AND v = ? AND invariant = ?",
+            (_type, n, v, key),
+        )
+        for code, in rows.fetchall():
+            order, edges = graph6.decode(code)
+            if isomorphism(state, GraphState(order, edges)) is not None:
+                return True
+        return False
+
+    def best(self, _type : str, n : int, v : int) -> Optional[int]:
+        row = self.connection.execute(
+            "SELECT E FROM best WHERE type = ? AND n = ? AND v = ?", (_type, n, v),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def query(
+            self,
+            _type : str,
+            ns : Optional[Tuple[int, int]] = None,
+            vs : Optional[Tuple[int, int]] = None,
+    ) -> List[Dict]:
+        """Best energies with number of optima, for n and v in the inclusive
+        ranges ns and vs (all if None), ordered by n and v."""
+        sql = (
+            "SELECT b.n, b.v, b.E, COUNT(g.graph6) FROM best b "
+            "LEFT JOIN graphs g ON g.type = b.type AND g.n = b.n AND g.v = b.v "
+            "WHERE b.type = ?"
+        )
+        args : List = [_type]
+        for column, bounds in (("n", ns), ("v", vs)):
+            if bounds is not None:
+                sql += f" AND b.{column} BETWEEN ? AND ?"
+                args.extend(bounds)
+        sql += " GROUP BY b.n, b.v ORDER BY b.n, b.v"
+        return [
+            {"type": _type, "n": n, "v": v, "E": E, "optima": count}
+            for n, v, E, count in self.connection.execute(sql, args)
+        ]
+
+    def optima(self, _type : str, n : int, v : int) -> List[Dict]:
+        """All stored optima of a key with their provenance, oldest first."""
+        rows = self.connection.execute(
+            "SELECT graph6, E, engine, seed, seconds, created FROM graphs "
+            "WHERE type = ? AND n = ? AND v = ? ORDER BY created", (_type, n, v),
+        )
+        return [
+            dict(zip(("graph6", "E", "engine", "seed", "seconds", "created"), row))
+            for row in rows
+        ]
+
+    def graphs(self, _type : str, n : int, v : int) -> List["nx.Graph"]:
+        import networkx as nx
+        result = []
+        for optimum in self.optima(_type, n, v):
+            order, edges = graph6.decode(optimum["graph6"])
+            G = nx.Graph()
+            G.add_nodes_from(range(order))
+            G.add_edges_from(edges.tolist())
+            result.append(G)
+        return result
+
+    def load_sweep(self, directory : str, engine : str = "sa") -> Dict[str, int]:
+        """Records all results of a sweep directory (see sweep.Sweep).
+        Returns counts of statuses of record."""
+        counts : Dict[str, int] = {}
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(directory, name)) as f:
+                r = json.load(f)
+            status = self.record(
+                r["type"], r["n"], r["v"], r["E"], r["edges"], engine,
+                seconds=r.get("seconds"),
+            )
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def latex_table(
+            self,
+            _type : str,
+            ns : Optional[Tuple[int, int]] = None,
+            vs : Optional[Tuple[int, int]] = None,
+            cols : int = 5,
+    ) -> str:
+        """Table of Conjecture.latex_table with values from the catalog. For
+        max, values at the cyclomatic number of the maximal graphs of
+        Theorem are bold."""
+        values = []
+        if _type == 'max':
+            from theorem import Theorem
+            theorem = Theorem()
+        for r in self.query(_type, ns, vs):
+            bold = False
+            if _type == 'max':
+                k = theorem.gamma(r["n"])
+                ks = tuple({k}) if isinstance(k, int) else k
+                bold = any(r["v"] == theorem.cyclomatic_number_of(r["n"], k) for k in ks)
+            values.append((r["n"], r["v"], r["E"], bold))
+        while len(values) % cols != 0:
+            values.append(("", "", "", False))
+        rows = len(values) // cols
+        h = lambda t: r"\textbf{" + t + "}"
+        lines = [r"\begin{tabular}{" + "|c|c|c|"*cols + "}", r"\hline"]
+        lines.append(" & ".join([r"$n$ & $\nu$ & $\cM(G_{n, \nu})$"]*cols) + r"\\ \hline")
+        for r in range(rows):
+            row_items = []
+            for c in range(cols):
+                n_val, v_val, E, bold = values[r + c*rows]
+                row_items.extend([str(n_val), str(v_val), h(str(E)) if bold else str(E)])
+            lines.append(" & ".join(row_items) + r"\\ \hline")
+        lines.append(r"\end{tabular}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from conjecture import Base, Conjecture
+    from graph_state import GraphState
+    conjecture = Conjecture()
+    with Catalog("catalog.sqlite") as catalog:
+        for n in range(5, 12):
+            for v in range(1, n):
+                if Base.graph_exists(n, v):
+                    state = GraphState.from_networkx(conjecture.max.G(n, v))
+                    catalog.record('max', n, v, state.cM2(), state.edges, "conjecture")
+        print(catalog.latex_table('max'))
@@ -1,11 +1,16 @@
-from math import sqrt, ceil
-import networkx as nx
-import matplotlib.pyplot as plt
+from math import sqrt, ceil, isqrt
+from functools import lru_cache
+import numpy as np
 
-from typing import Mapping, Collection, Hashable, Optional
+from typing import Mapping, Collection, Hashable, Optional, TYPE_CHECKING
 from abc import ABC, abstractmethod
 from theorem import Theorem
 
+# networkx and matplotlib take most of the import time and are only needed
+# for graphs and pictures, so they are imported where used.
+if TYPE_CHECKING:
+    import networkx as nx
+
 class Base:
     @staticmethod
     def graph_exists(n, v):
@@ -13,11 +18,13 @@ class Base:
     
     @staticmethod
     def _save_graph(
-        G: nx.Graph, path: str, 
+        G: "nx.Graph", path: str, 
         layout_fun: Optional[Mapping[Hashable, Collection[float]]]
     ) -> None:
         """Saves graph using layout given by layout_fun. 
         Example of layout function is nx.sprint_layout"""
+        import networkx as nx
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(6,6))
         pos = layout_fun(G)
         nx.draw_networkx_nodes(G, pos, node_color='black',node_size=300)
@@ -32,41 +39,84 @@ class Base:
         pass 
 
     @abstractmethod 
-    def G(n: int, v: int) -> nx.Graph:
+    def G(n: int, v: int) -> "nx.Graph":
         pass
 
     @abstractmethod
-    def save_graph(self, G: nx.Graph, path: str) -> None:
+    def save_graph(self, G: "nx.Graph", path: str) -> None:
         pass
 
 class Max(Base):
-    def find_a_b(self, n, v):
-        """Let n be the order of graph G, and let v be its cyclomatic number."""
-        assert super().graph_exists(n, v), "Graph does not exist."
-        def b_from_a(n, v, a): 
-            return (1 + a)*(4 + a - 2*n) / 2 + v
-        for a in range(n-2):
-            b = b_from_a(n, v, a)
-            if 0 < b < n - 2 - a:
-                return (int(a), int(b))
+    @staticmethod
+    def _first_a(n, v):
+        """Smallest a >= 0 with b(a) + a < n - 2, where b(a) = (1 + a)(4 + a - 2n)/2 + v.
+        That is the smallest a with a**2 + (7 - 2n)a + 10 - 4n + 2v <= 0. Works
+        elementwise on arrays, starting just below the smaller root."""
+        Q = lambda a: a*a + (7 - 2*n)*a + 10 - 4*n + 2*v
+        D = (2*n - 3)**2 - 8*v
+        if isinstance(D, int):
+            a = max(0, (2*n - 7 - isqrt(max(D, 0))) // 2 - 1)
+            while Q(a) > 0 and a < n:
+                a += 1
+            return a
+        s = np.floor(np.sqrt(np.maximum(D, 0))).astype(np.int64)
+        a = np.maximum(0, (2*n - 7 - s) // 2 - 2)
+        for _ in range(5):
+            a = np.where(Q(a) > 0, a + 1, a)
+        return a
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def find_a_b(n, v):
+        """Let n be the order of graph G, and let v be its cyclomatic number.
+        b(a) is decreasing in a and b(a) + a is non-increasing, so the first a
+        of the scan over range(n-2) is the first one with b(a) + a < n - 2.
+        Cached per (n, v) for all instances."""
+        assert Base.graph_exists(n, v), "Graph does not exist."
+        a = Max._first_a(n, v)
+        b = (1 + a)*(4 + a - 2*n) // 2 + v
+        if a < n - 2 and 0 < b < n - 2 - a:
+            return (a, b)
         raise Warning("Unexpected error. Parameters (a, b) not found.")
 
-    def cM2(self, n, v):
-        """Returns maximum possible cM2 over graphs with order n and cyclomatic number v."""
-        assert super().graph_exists(n, v), "Graph does not exist."
-        if n >= v + 2:
-            return n * (n-1) * (n-2) + v * (v**2 + v - 8)
-        a, b = self.find_a_b(n, v)
+    @staticmethod
+    def _cM2(n, v, a, b):
         term1 = ((n-1)**2 - (2+a+b)**2) * (2 + a)
         term2 = ((2+a+b)**2 - (3+a)**2) * b 
         term3 = ((n-1)**2 - (3+a)**2) * 2 * b 
         term4 = ((n-1)**2 - (3+a)**2) * a * b 
         term5 = ((n-1)**2 - (2+a)**2) * 2 * (n-3-a-b)
         term6 = ((n-1)**2 - (2+a)**2) * a * (n-3-a-b)
-        return sum((term1, term2, term3, term4, term5, term6))
+        return term1 + term2 + term3 + term4 + term5 + term6
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def cM2(n, v):
+        """Returns maximum possible cM2 over graphs with order n and cyclomatic number v."""
+        assert Base.graph_exists(n, v), "Graph does not exist."
+        if n >= v + 2:
+            return n * (n-1) * (n-2) + v * (v**2 + v - 8)
+        a, b = Max.find_a_b(n, v)
+        return Max._cM2(n, v, a, b)
+
+    def cM2_table(self, ns, vs):
+        """Array of maximal cM2 with rows indexed by ns and columns by vs.
+        Entries for which a graph does not exist are -1."""
+        n = np.asarray(ns, dtype=np.int64)[:, None]
+        v = np.asarray(vs, dtype=np.int64)[None, :]
+        exists = 2*v <= (n-1)*(n-2)
+        a = self._first_a(n, v)
+        b = (1 + a)*(4 + a - 2*n) // 2 + v
+        table = np.where(
+            n >= v + 2,
+            n * (n-1) * (n-2) + v * (v**2 + v - 8),
+            self._cM2(n, v, a, b),
+        )
+        return np.where(exists, table, -1)
     
     def G(self, n, v):
         """Returns graph which reaches maximal cM2 for a given order n and cyclomatic number v."""
+        import networkx as nx
         assert super().graph_exists(n, v), "Graph does not exist."
         if n >= v + 2: 
             Z = nx.star_graph(v)
@@ -97,9 +147,30 @@ class Max(Base):
             return G
 
     def save_graph(self, G, path):
+        import networkx as nx
         super()._save_graph(G, path, layout_fun=nx.circular_layout)
 
+# Seconds of exact search for callers that can do without the value of min
+# for n < 2v - 1, e.g. targets of annealing runs and summaries.
+TIME_BUDGET = 1.0
+
+@lru_cache(maxsize=None)
+def _min_search(n, v, time_budget):
+    """(graph, cM2) of MinSearch, or None if it did not finish within
+    time_budget. Cached per (n, v, time_budget), timeouts included, so an
+    unsolved pair does not spend its budget again."""
+    from degree_search import MinSearch
+    search = MinSearch(n, v, time_budget)
+    result = search.solve()
+    return result if search.stats["optimal"] else None
+
 class Min(Base):
+    """time_budget bounds in seconds the exact search for n < 2v - 1. The
+    default None does not bound it, so results do not depend on the speed of
+    the machine. When a budget runs out, cM2 and G raise ValueError."""
+    def __init__(self, time_budget : Optional[float] = None):
+        self.time_budget = time_budget
+
     def cM2(self, n, v):
         assert super().graph_exists(n, v), "Graph does not exist."
         if v == 1: 
@@ -110,15 +181,30 @@ class Min(Base):
             return 10
         if n > 2*v - 1: 
             return 8 
-        else: 
-            raise ValueError("Not implemented.")
+        return self.search(n, v)[1]
+
+    def search(self, n, v):
+        """Exact (graph, cM2) by degree sequence search, for n < 2v - 1 where
+        no construction is known. Raises ValueError if the search is not done
+        within self.time_budget."""
+        result = _min_search(n, v, self.time_budget)
+        if result is None:
+            raise ValueError("Exact search ran out of its time budget.")
+        return result
         
     def G(self, n, v):
         """Returns graph which reaches minimal cM2 for a given order n and cyclomatic number v."""
+        import networkx as nx
         assert super().graph_exists(n, v), "Graph does not exist."
+        if v == 1:
+            return nx.cycle_graph(n)
         if n >= 2*v - 1:
             T = nx.complete_graph(4)
             T.remove_edge(2, 3)
+            if v == 2: # paths hanging from both vertices of degree 2
+                for i in range(4, n):
+                    T.add_edge(i-2, i)
+                return T
             u, w, order_of_T = 2, 3, 4 
             while order_of_T < 2*v-1:
                 if order_of_T + 2 < 2*v-1: 
@@ -128,19 +214,20 @@ class Min(Base):
                     T.add_edge(u, w)
                 else: 
                     order_of_T += 1
-                    T.add_edge(u, 2*v-1)
-                    T.add_edge(w, 2*v-1)
-            for i in range(2*v, n):
+                    T.add_edge(u, 2*v-2)
+                    T.add_edge(w, 2*v-2)
+            for i in range(2*v-1, n):
                 T.add_edge(i-1, i)
             return T
-        else: raise ValueError("Not implemented")
+        return self.search(n, v)[0].copy()
 
     def save_graph(self, G, path):
+        import networkx as nx
         super()._save_graph(G, path, layout_fun=nx.spring_layout)
 
 class Conjecture:
-    def __init__(self):
-        self.min = Min() 
+    def __init__(self, time_budget : Optional[float] = None):
+        self.min = Min(time_budget)
         self.max = Max()
 
 if __name__ == "__main__":
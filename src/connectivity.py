@@ -0,0 +1,180 @@
+import numpy as np
+from typing import Optional, List, Tuple
+from graph_state import GraphState, Edge
+
+class BridgeOracle:
+    """Tells which swaps (remove uv, add wx) keep a connected graph state connected.
+
+    Removing a non-bridge never disconnects the graph. Every bridge is an edge
+    of any spanning tree, and removing a bridge uv splits the graph into the
+    subtree below uv and the rest, so the swap is fine only if wx has exactly
+    one end in that subtree. The oracle keeps a rooted spanning tree with
+    preorder intervals [tin, tout) and, for the tree edge (parent, c) at its
+    lower end c, cover[c]: the number of non-tree edges whose cycle in the
+    tree passes it. Tree edges with cover 0 are the bridges: above[c] is the
+    parent of c if edge (parent, c) is a bridge and -1 otherwise.
+
+    The tree is built by one DFS and then updated per accepted swap. Moving a
+    non-tree edge changes cover on two tree paths only. Removing a tree edge
+    uncovers just the non-tree edges across its cut, hangs the subtree below
+    it on one of them (wx if it crosses), re-rooted at its end, and covers
+    the rest again; the preorder of the subtree is rebuilt from O(depth)
+    slices of the old one."""
+    def __init__(self, state : GraphState):
+        self.state = state
+        self.dirty = True
+        self.pending : Optional[List[Tuple[Edge, Edge]]] = None
+        self.refresh()
+
+    def update(self, uv : Optional[Edge] = None, wx : Optional[Edge] = None) -> None:
+        """Call after a swap was accepted. Bridges are updated from the swap
+        uv -> wx on the next query, or rebuilt if it is not given."""
+        if uv is None or wx is None:
+            self.pending = None
+        elif self.pending is not None:
+            self.pending.append((uv, wx))
+        self.dirty = True
+
+    def refresh(self) -> None:
+        if not self.dirty:
+            return
+        if self.pending is not None and len(self.pending) == 1:
+            self._swap(*self.pending[0])
+        else:
+            self._build()
+        self.pending = []
+        u, v = self.state.edges[:, 0], self.state.edges[:, 1]
+        self.above = np.where((self.cover == 0) & (self.parent >= 0), self.parent, -1)
+        c = np.where(self.tin[v] > self.tin[u], v, u)
+        self.child = np.where(self.above[c] == u + v - c, c, -1).astype(np.int64)
+        self.dirty = False
+
+    def _build(self) -> None:
+        """DFS tree of the state, cover from its back edges by prefix sums."""
+        n, neighbours = self.state.n, self.state.adjacency()
+        parent, tin, tout, order = [-1] * n, [-1] * n, [0] * n, [0]
+        tin[0] = 0
+        stack = [(0, iter(neighbours[0]))]
+        while stack:
+            v, it = stack[-1]
+            for y in it:
+                if tin[y] == -1:
+                    parent[y], tin[y] = v, len(order)
+                    order.append(y)
+                    stack.append((y, iter(neighbours[y])))
+                    break
+            else:
+                stack.pop()
+                tout[v] = len(order)
+        self.parent, self.tin, self.tout = np.array(parent), np.array(tin), np.array(tout)
+        self.order = np.array(order)
+        e = self.state.edges
+        back = e[(self.parent[e[:, 0]] != e[:, 1]) & (self.parent[e[:, 1]] != e[:, 0])]
+        lower = self.tin[back[:, 1]] > self.tin[back[:, 0]]
+        mark = np.bincount(np.where(lower, back[:, 1], back[:, 0]), minlength=n)
+        mark -= np.bincount(np.where(lower, back[:, 0], back[:, 1]), minlength=n)
+        prefix = np.concatenate(([0], np.cumsum(mark[self.order])))
+        self.cover = prefix[self.tout] - prefix[self.tin]
+
+    def _cover(self, pairs : List[Edge], d : int) -> None:
+        """Adds d to cover of the tree edges on the paths between the pairs,
+        walked on lists, as they may be long."""
+        tin, tout, parent = self.tin.tolist(), self.tout.tolist(), self.parent.tolist()
+        lower : List[int] = []
+        for y, z in pairs:
+            while not tin[y] <= tin[z] < tout[y]:
+                lower.append(y)
+                y = parent[y]
+            while z != y:
+                lower.append(z)
+                z = parent[z]
+        np.add.at(self.cover, lower, d)
+
+    def _swap(self, uv : Edge, wx : Edge) -> None:
+        u, v = uv
+        parent, tin, tout, order = self.parent, self.tin, self.tout, self.order
+        if parent[v] != u and parent[u] != v:
+            self._cover([uv], -1)
+            self._cover([wx], 1)
+            return
+        c = v if parent[v] == u else u
+        lo, hi = tin[c], tout[c]
+        s = hi - lo
+        edges = self.state.edges
+        inside = (lo <= tin[edges]) & (tin[edges] < hi)
+        crossing = [tuple(e) for e in edges[inside[:, 0] != inside[:, 1]].tolist()]
+        added = GraphState.key(*wx)
+        if not crossing:
+            raise ValueError(f"Swap {uv} -> {wx} disconnects the graph.")
+        self._cover([e for e in crossing if GraphState.key(*e) != added], -1)
+        r = next((e for e in crossing if GraphState.key(*e) == added), crossing[0])
+        a, b = r if lo <= tin[r[0]] < hi else r[::-1]
+
+        # re-root the subtree of c at a: a with its old subtree first, then
+        # every vertex up the path with the rest of its old subtree
+        path = [a]
+        while path[-1] != c:
+            path.append(int(parent[path[-1]]))
+        size = tout - tin
+        old = size[path].tolist()
+        segments = [order[tin[a]:tout[a]]]
+        for j in range(1, len(path)):
+            y, below = path[j], path[j - 1]
+            segments += [order[tin[y]:tin[below]], order[tout[below]:tout[y]]]
+        grow = (tin <= tin[b]) & (tin[b] < tout)
+        size[(tin < lo) & (tout >= hi)] -= s
+        size[grow] += s
+        total = 0
+        for j in range(len(path) - 1, 0, -1):
+            total += old[j] - old[j - 1]
+            size[path[j]] = total
+            parent[path[j]] = path[j - 1]
+            self.cover[path[j]] = self.cover[path[j - 1]]
+        size[a], parent[a], self.cover[a] = s, b, 0
+
+        # move the block of the subtree right after b
+        rest = np.concatenate((order[:lo], order[hi:]))
+        at = tin[b] + 1 if tin[b] < lo else tin[b] + 1 - s
+        self.order = np.concatenate((rest[:at], *segments, rest[at:]))
+        tin[self.order] = np.arange(len(self.order))
+        np.add(tin, size, out=tout)
+
+        again = [e for e in crossing if e != r]
+        if all(GraphState.key(*e) != added for e in crossing):
+            again.append(wx)
+        self._cover(again, 1)
+
+    def _child(self, uv : Edge) -> int:
+        """Lower end of edge uv if it is a bridge, else -1."""
+        u, v = uv
+        c = v if self.tin[v] > self.tin[u] else u
+        return c if self.above[c] == u + v - c else -1
+
+    def is_bridge(self, uv : Edge) -> bool:
+        self.refresh()
+        return self._child(uv) >= 0
+
+    def valid(self, uv : Edge, wx : Edge) -> bool:
+        """Whether the graph stays connected after removing uv and adding wx."""
+        self.refresh()
+        c = self._child(uv)
+        if c < 0:
+            return True
+        lo, hi = self.tin[c], self.tout[c]
+        w, x = wx
+        return (lo <= self.tin[w] < hi) != (lo <= self.tin[x] < hi)
+
+    def mask(self, non_edges : np.ndarray) -> np.ndarray:
+        """Boolean matrix of valid swaps state.edges[i] -> non_edges[j]."""
+        self.refresh()
+        return self.valid_mask(self.tin, self.tout, self.child, non_edges)
+
+    @staticmethod
+    def valid_mask(
+            tin : np.ndarray, tout : np.ndarray, child : np.ndarray, non_edges : np.ndarray,
+    ) -> np.ndarray:
+        """mask from the arrays of a refreshed oracle, e.g. in another process."""
+        c = child[:, None]
+        lo, hi = tin[c], tout[c]
+        tw, tx = tin[non_edges[None, :, 0]], tin[non_edges[None, :, 1]]
+        return (c < 0) | (((lo <= tw) & (tw < hi)) != ((lo <= tx) & (tx < hi)))
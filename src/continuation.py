@@ -0,0 +1,69 @@
+import networkx as nx
+import numpy as np
+from typing import (
+    Dict, Tuple,
+)
+from graph_state import GraphState
+from scoring import SwapScorer
+from simulated_annealing import random_connected_graph
+
+# An optimum of (n, v) is usually a small edit of an optimum of (n - 1, v)
+# or (n, v - 1). Both edits are scored for all choices at once: only the
+# degrees of the ends of the new edge change, so by SwapScorer.vertex_gains
+# the change of cM2 is a sum of per-vertex terms and the term of the new edge.
+
+def vertex_changes(degree : np.ndarray, edges : np.ndarray) -> np.ndarray:
+    """Change of cM2 after joining a new pendant vertex to s, for every s."""
+    degree = np.asarray(degree, dtype=np.int64)
+    gains = SwapScorer.vertex_gains(degree, edges)[2]
+    return gains + np.abs((degree + 1)**2 - 1)
+
+def edge_changes(degree : np.ndarray, edges : np.ndarray, non_edges : np.ndarray) -> np.ndarray:
+    """Change of cM2 after adding non_edges[j], for every j."""
+    degree = np.asarray(degree, dtype=np.int64)
+    gains = SwapScorer.vertex_gains(degree, edges)[2]
+    w, x = non_edges[:, 0], non_edges[:, 1]
+    return gains[w] + gains[x] + np.abs((degree[w] + 1)**2 - (degree[x] + 1)**2)
+
+def _pick(changes : np.ndarray, _type : str, rng : np.random.Generator) -> int:
+    """Index of the best change, ties broken at random."""
+    best = changes.min() if _type == 'min' else changes.max()
+    return int(rng.choice(np.flatnonzero(changes == best)))
+
+def add_vertex(state : GraphState, _type : str, rng : np.random.Generator) -> Tuple[GraphState, int]:
+    """Best extension of state by a pendant vertex n, with its cM2."""
+    changes = vertex_changes(state.degree, state.edges)
+    s = _pick(changes, _type, rng)
+    edges = np.concatenate((state.edges, [(s, state.n)]))
+    return GraphState(state.n + 1, edges), state.cM2() + int(changes[s])
+
+def add_edge(state : GraphState, _type : str, rng : np.random.Generator) -> Tuple[GraphState, int]:
+    """Best extension of state by one more edge, with its cM2."""
+    non_edges = state.non_edges()
+    if len(non_edges) == 0: raise ValueError("Graph is complete.")
+    changes = edge_changes(state.degree, state.edges, non_edges)
+    j = _pick(changes, _type, rng)
+    edges = np.concatenate((state.edges, non_edges[j:j + 1]))
+    return GraphState(state.n, edges), state.cM2() + int(changes[j])
+
+def warm_start(
+        n : int,
+        v : int,
+        _type : str,
+        optima : Dict[Tuple[int, int], np.ndarray],
+        rng : np.random.Generator,
+) -> Tuple[nx.Graph, str]:
+    """Start graph for (n, v) from edges of known optima of (n - 1, v) and
+    (n, v - 1): the better of their best extensions, or a random connected
+    graph if neither is known. Returns the graph and where it came from
+    ("vertex", "edge" or "random")."""
+    candidates = []
+    if (n - 1, v) in optima:
+        candidates.append(add_vertex(GraphState(n - 1, optima[n - 1, v]), _type, rng) + ("vertex",))
+    if (n, v - 1) in optima:
+        candidates.append(add_edge(GraphState(n, optima[n, v - 1]), _type, rng) + ("edge",))
+    if not candidates:
+        return random_connected_graph(n, v, rng), "random"
+    sign = 1 if _type == 'min' else -1
+    state, _, origin = min(candidates, key=lambda c: sign * c[1])
+    return state.to_networkx(), origin
@@ -0,0 +1,220 @@
+import networkx as nx
+from collections import Counter
+from time import perf_counter
+from typing import (
+    Optional, Dict, List, Tuple, Iterator,
+)
+
+Sequence = Tuple[int, ...]
+
+class TimeBudgetExceeded(Exception):
+    pass
+
+class MinSearch:
+    """Exact minimal cM2 over connected graphs with order n and cyclomatic number v.
+
+    cM2 depends only on degrees along edges, so the search branches over
+    non-increasing degree sequences with sum 2(n - 1 + v), pruned by the
+    Erdos-Gallai inequalities. Every sequence gets a lower bound on cM2 of its
+    realisations, and sequences are realised in order of their bounds until the
+    bound reaches the best value found. Statistics are kept in self.stats."""
+    def __init__(self, n : int, v : int, time_budget : Optional[float] = None):
+        self.n, self.v = n, v
+        self.m = n - 1 + v
+        if not (n >= 2 and v >= 0 and 2*self.m <= n*(n-1)):
+            raise ValueError("Graph does not exist.")
+        self.time_budget = time_budget
+        self.stats = Counter()
+        self.best : Optional[int] = None
+        self.best_edges : List[Tuple[int, int]] = []
+
+    def _check_time(self) -> None:
+        if self.time_budget is not None and perf_counter() - self.start > self.time_budget:
+            raise TimeBudgetExceeded()
+
+    def _prefix_graphical(self, prefix : List[int], rest : int) -> bool:
+        """Erdos-Gallai inequalities for k <= len(prefix), with the unknown
+        remaining rest degrees bounded above by the last degree of prefix."""
+        total, last = 0, prefix[-1]
+        for k in range(1, len(prefix) + 1):
+            total += prefix[k-1]
+            right = k*(k-1) + sum(min(d, k) for d in prefix[k:]) + rest * min(last, k)
+            if total > right:
+                return False
+        return True
+
+    def sequences(self) -> Iterator[Sequence]:
+        """Graphical degree sequences d_1 >= ... >= d_n >= 1 with sum 2m."""
+        n, total = self.n, 2 * self.m
+        def extend(prefix, remaining):
+            self.stats["sequence nodes"] += 1
+            self._check_time()
+            rest = n - len(prefix)
+            if rest == 0:
+                if remaining == 0:
+                    yield tuple(prefix)
+                return
+            top = min(prefix[-1] if prefix else n - 1, remaining - (rest - 1))
+            for d in range(top, 0, -1):
+                if d * rest < remaining:
+                    break
+                prefix.append(d)
+                if self._prefix_graphical(prefix, rest - 1):
+                    yield from extend(prefix, remaining - d)
+                else:
+                    self.stats["sequences pruned"] += 1
+                prefix.pop()
+        yield from extend([], total)
+
+    def lower_bound(self, seq : Sequence) -> int:
+        """Lower bound on cM2 of connected realisations of seq.
+
+        Degree classes must be connected to each other, which costs at least
+        d_max^2 - d_min^2. Besides, a class of k vertices of degree d holds at
+        most k(k-1) of its kd edge ends (none for leaves), the others lie on
+        edges to other classes, each costing at least the gap to the nearest
+        other degree; an edge is seen from both of its ends. At least one end
+        leaves every class, and the number of ends leaving has the parity of kd."""
+        classes = Counter(seq)
+        if len(classes) == 1:
+            return 0
+        spread = max(classes)**2 - min(classes)**2
+        ends = 0
+        for d, k in classes.items():
+            gap = min(abs(d*d - e*e) for e in classes if e != d)
+            outside = k if d == 1 else max(1, k*d - k*(k-1))
+            outside += (outside - k*d) % 2
+            ends += outside * gap
+        return max(spread, -(-ends // 2))
+
+    def _connected(self, adj : List[int]) -> bool:
+        full = (1 << self.n) - 1
+        seen = frontier = 1
+        while frontier:
+            reach, f = 0, frontier
+            while f:
+                low = f & -f
+                reach |= adj[low.bit_length() - 1]
+                f ^= low
+            frontier = reach & ~seen
+            seen |= frontier
+        return seen == full
+
+    @staticmethod
+    def _residual_graphical(r : List[int], adj : List[int], open_ : List[int]) -> bool:
+        """Necessary conditions for completing the graph: every open vertex
+        has enough open non-neighbours and residual degrees are graphical."""
+        mask = sum(1 << x for x in open_)
+        for x in open_:
+            if r[x] > (mask & ~adj[x]).bit_count() - 1:
+                return False
+        residual = sorted((r[x] for x in open_), reverse=True)
+        if sum(residual) % 2:
+            return False
+        total = 0
+        for k in range(1, len(residual) + 1):
+            total += residual[k-1]
+            if total > k*(k-1) + sum(min(d, k) for d in residual[k:]):
+                return False
+        return True
+
+    @staticmethod
+    def _choices(groups : List[List[int]], k : int) -> Iterator[List[int]]:
+        """k vertices, taking a prefix of each group."""
+        if k == 0:
+            yield []
+            return
+        if not groups:
+            return
+        first, rest = groups[0], groups[1:]
+        if sum(len(g) for g in rest) + len(first) < k:
+            return
+        for c in range(min(len(first), k), -1, -1):
+            for chosen in MinSearch._choices(rest, k - c):
+                yield first[:c] + chosen
+
+    def _realise(self, d, r, adj, edges, u, cost) -> None:
+        """Depth first search over realisations of d, adding all edges of the
+        first vertex u with residual degree to later vertices at once.
+        Later vertices with equal degree, residual degree and neighbourhood are
+        interchangeable, only the number chosen from each such class matters."""
+        self.stats["realisation nodes"] += 1
+        self._check_time()
+        n, sq = self.n, self.squares
+        while u < n and r[u] == 0:
+            u += 1
+        if u == n:
+            if self._connected(adj) and (self.best is None or cost < self.best):
+                self.best, self.best_edges = cost, list(edges)
+            return
+        open_ = [w for w in range(u + 1, n) if r[w] > 0]
+        if not self._residual_graphical(r, adj, [u] + open_):
+            self.stats["realisations pruned"] += 1
+            return
+        residual = Counter()
+        count = Counter()
+        for x in [u] + open_:
+            residual[d[x]] += r[x]
+            count[d[x]] += 1
+        bound = 0
+        for e in residual:
+            if count[e] == 1 or residual[e] % 2:
+                gap = min(abs(e*e - f*f) for f in count if f != e)
+                bound += gap * (residual[e] if count[e] == 1 else 1)
+        if self.best is not None and cost + -(-bound // 2) >= self.best:
+            self.stats["realisations pruned"] += 1
+            return
+        groups : Dict[Tuple, List[int]] = {}
+        for w in open_:
+            groups.setdefault((d[w], r[w], adj[w]), []).append(w)
+        for chosen in self._choices(list(groups.values()), r[u]):
+            step = sum(abs(sq[u] - sq[w]) for w in chosen)
+            if self.best is not None and cost + step >= self.best:
+                continue
+            r[u] = 0
+            for w in chosen:
+                r[w] -= 1
+                adj[u] |= 1 << w
+                adj[w] |= 1 << u
+                edges.append((u, w))
+            self._realise(d, r, adj, edges, u + 1, cost + step)
+            for w in chosen:
+                r[w] += 1
+                adj[u] &= ~(1 << w)
+                adj[w] &= ~(1 << u)
+                edges.pop()
+            r[u] = len(chosen)
+
+    def solve(self) -> Tuple[Optional[nx.Graph], Optional[int]]:
+        """Returns a minimal graph and its cM2. If the time budget runs out,
+        the best graph found so far is returned and stats["optimal"] is 0."""
+        self.start = perf_counter()
+        self.stats["optimal"] = 1
+        try:
+            candidates = sorted(
+                (self.lower_bound(seq), seq) for seq in self.sequences()
+            )
+            self.stats["sequences"] = len(candidates)
+            for bound, seq in candidates:
+                if self.best is not None and bound >= self.best:
+                    self.stats["sequences cut by bound"] = len(candidates) - self.stats["sequences realised"]
+                    break
+                self.stats["sequences realised"] += 1
+                self.squares = [d*d for d in seq]
+                self._realise(list(seq), list(seq), [0] * self.n, [], 0, 0)
+        except TimeBudgetExceeded:
+            self.stats["optimal"] = 0
+        self.stats["seconds"] = perf_counter() - self.start
+        if self.best is None:
+            return (None, None)
+        G = nx.Graph()
+        G.add_nodes_from(range(self.n))
+        G.add_edges_from(self.best_edges)
+        return (G, self.best)
+
+
+if __name__ == "__main__":
+    for n, v in [(6, 5), (8, 7), (10, 9), (12, 11)]:
+        search = MinSearch(n, v)
+        G, cM2 = search.solve()
+        print(n, v, cM2, dict(search.stats))
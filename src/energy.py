@@ -0,0 +1,73 @@
+from typing import (
+    Optional, Dict, Tuple,
+)
+from graph_state import GraphState, Edge
+
+def better(_type : str, E, F):
+    """Whether energy E is strictly better than F for problem _type ('min'
+    or 'max'), elementwise on arrays."""
+    return E < F if _type == 'min' else E > F
+
+class IncrementalCM2:
+    """Keeps cM2 of a graph state up to date under edge swaps.
+
+    A swap removes edge uv and adds non-edge wx. Only degrees of u, v, w, x
+    change, hence the change of cM2 depends only on edges incident to them.
+    The state is modified in place, it is never copied."""
+    def __init__(self, state : GraphState):
+        self.state = state
+        self.value = state.cM2()
+        self.last : Optional[Tuple[Edge, Edge, int, int]] = None
+
+    def changed_degrees(self, uv : Edge, wx : Edge) -> Dict[int, int]:
+        """New degrees of vertices whose degree is changed by the swap."""
+        change : Dict[int, int] = {}
+        for s in uv:
+            change[s] = change.get(s, 0) - 1
+        for s in wx:
+            change[s] = change.get(s, 0) + 1
+        degree = self.state.degree
+        return {s: int(degree[s]) + d for s, d in change.items() if d != 0}
+
+    def delta(self, uv : Edge, wx : Edge) -> int:
+        """Exact change of cM2 after removing uv and adding wx, in O(deg)
+        beyond a scan of n/8 bytes of adjacency bits per changed vertex."""
+        degree, new = self.state.degree.item, self.changed_degrees(uv, wx)
+        removed = set(uv)
+        vertices = list(new)
+        position = {s: k for k, s in enumerate(vertices)}
+        change = 0
+        for k, y in zip(*(a.tolist() for a in self.state.incident(vertices))):
+            if position.get(y, k) < k:
+                continue # edge already counted from y
+            s = vertices[k]
+            old = abs(degree(s)**2 - degree(y)**2)
+            if s in removed and y in removed:
+                change -= old
+                continue
+            change += abs(new[s]**2 - new.get(y, degree(y))**2) - old
+        w, x = wx
+        change += abs(new.get(w, degree(w))**2 - new.get(x, degree(x))**2)
+        return change
+
+    def apply(self, uv : Edge, wx : Edge, i : Optional[int] = None) -> int:
+        """Performs the swap in place, uv in row i of the edge array if given.
+        It can be undone by rollback."""
+        change = self.delta(uv, wx)
+        if i is None:
+            i = self.state.row(*uv)
+        self.state.swap(uv, wx, i)
+        self.value += change
+        self.last = (uv, wx, i, change)
+        return change
+
+    def commit(self) -> None:
+        self.last = None
+
+    def rollback(self) -> None:
+        """Undoes the last applied swap."""
+        if self.last is None: raise ValueError("Nothing to roll back.")
+        uv, wx, i, change = self.last
+        self.state.swap(wx, uv, i)
+        self.value -= change
+        self.last = None
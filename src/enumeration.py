@@ -0,0 +1,317 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Optional, Dict, List, Tuple, Iterator,
+)
+import graph6
+from energy import better
+
+# Graphs are lists of adjacency bitmasks: bit u of adj[v] is set iff uv is an edge.
+
+def _refine(adj : List[int], cells : List[List[int]]) -> List[List[int]]:
+    """Equitable refinement of an ordered partition of vertices."""
+    while True:
+        masks = [sum(1 << v for v in cell) for cell in cells]
+        refined = []
+        for cell in cells:
+            if len(cell) == 1:
+                refined.append(cell)
+                continue
+            signature = {
+                v: tuple((adj[v] & mask).bit_count() for mask in masks) for v in cell
+            }
+            for s in sorted(set(signature.values())):
+                refined.append([v for v in cell if signature[v] == s])
+        if len(refined) == len(cells):
+            return refined
+        cells = refined
+
+def _code(adj : List[int], order : List[int]) -> int:
+    """Adjacency matrix of the graph relabeled by order, read row by row as bits."""
+    n = len(adj)
+    position = [0] * n
+    for i, v in enumerate(order):
+        position[v] = i
+    code = 0
+    for v in order:
+        row, a = 0, adj[v]
+        while a:
+            low = a & -a
+            row |= 1 << position[low.bit_length() - 1]
+            a ^= low
+        code = (code << n) | row
+    return code
+
+def _same_orbit(v : int, tried : List[int], autos : List[List[int]], n : int) -> bool:
+    parent = list(range(n))
+    def find(x):
+        while parent[x] != x:
+            parent[x] = x = parent[parent[x]]
+        return x
+    for sigma in autos:
+        for x, y in enumerate(sigma):
+            parent[find(x)] = find(y)
+    return any(find(v) == find(t) for t in tried)
+
+def canonical_form(adj : List[int]) -> Tuple[int, List[int]]:
+    """Canonical code and order (order[i] gets label i) of a graph.
+
+    Individualisation-refinement search taking the largest code over all
+    leaves; branches equivalent under automorphisms found so far, which fix
+    the current path, are pruned. Isomorphic graphs get equal codes."""
+    n = len(adj)
+    best : List = [-1, None]
+    first : List = [None, None]
+    autos : List[List[int]] = []
+
+    def automorphism(order, reference):
+        sigma = [0] * n
+        for v, w in zip(order, reference):
+            sigma[v] = w
+        return sigma
+
+    def search(cells, path):
+        if len(cells) == n:
+            order = [cell[0] for cell in cells]
+            code = _code(adj, order)
+            if first[0] is None:
+                first[:] = [code, order]
+            elif code == first[0]:
+                autos.append(automorphism(order, first[1]))
+            if code > best[0]:
+                best[:] = [code, order]
+            elif code == best[0] and best[1] is not first[1]:
+                autos.append(automorphism(order, best[1]))
+            return
+        i = next(i for i, cell in enumerate(cells) if len(cell) > 1)
+        target, tried = cells[i], []
+        for v in target:
+            fixing = [s for s in autos if all(s[p] == p for p in path)]
+            if tried and _same_orbit(v, tried, fixing, n):
+                continue
+            tried.append(v)
+            rest = [w for w in target if w != v]
+            search(_refine(adj, cells[:i] + [[v], rest] + cells[i + 1:]), path + [v])
+
+    search(_refine(adj, [list(range(n))]), [])
+    return best[0], best[1]
+
+def _connected_without(adj : List[int], y : int) -> bool:
+    rest = ((1 << len(adj)) - 1) & ~(1 << y)
+    if rest == 0:
+        return True
+    seen = frontier = rest & -rest
+    while frontier:
+        reach, f = 0, frontier
+        while f:
+            low = f & -f
+            reach |= adj[low.bit_length() - 1]
+            f ^= low
+        frontier = reach & rest & ~seen
+        seen |= frontier
+    return seen == rest
+
+def _delete(adj : List[int], y : int) -> List[int]:
+    low = (1 << y) - 1
+    return [
+        (a & low) | ((a >> 1) & ~low)
+        for v, a in enumerate(adj) if v != y
+    ]
+
+class ConnectedGraphs:
+    """Connected graphs of order n (and m edges), one per isomorphism class.
+
+    Canonical augmentation by vertex addition: a graph G on k + 1 vertices
+    is accepted from parent P = G - x only if G - x is isomorphic to G - y,
+    where y is the canonical deletion vertex of G: the non-cut vertex of
+    maximum degree which is last in the canonical order. Isomorphic children
+    of the same parent are removed by their canonical codes. Graphs are
+    streamed, only one parent per level is kept in memory.
+
+    With mod > 1, graphs of order n - 1 are numbered in generation order and
+    only those with number res modulo mod are extended, so that mod
+    processes split one order without coordination."""
+    def __init__(
+            self,
+            n : int,
+            m : Optional[int] = None,
+            res : int = 0,
+            mod : int = 1,
+    ):
+        self.n, self.m = n, m
+        self.res, self.mod = res, mod
+        self.split = n - 1
+        self.counter = 0
+
+    def _feasible(self, k : int, edges : int) -> bool:
+        """Whether a graph on k vertices with given edges can grow to m edges."""
+        if self.m is None:
+            return True
+        rest = self.n - k
+        return edges + rest <= self.m <= edges + rest * (k + self.n - 1) // 2
+
+    def _accept(self, adj : List[int], parent_code : int) -> Optional[int]:
+        """Canonical code of adj if it is the canonical child of its parent."""
+        x = len(adj) - 1
+        degree = [a.bit_count() for a in adj]
+        if any(degree[v] > degree[x] and _connected_without(adj, v) for v in range(x)):
+            return None
+        ties = [
+            v for v in range(x)
+            if degree[v] == degree[x] and _connected_without(adj, v)
+        ]
+        code, order = canonical_form(adj)
+        if ties:
+            y = max(ties + [x], key=order.index)
+            if y != x and canonical_form(_delete(adj, y))[0] != parent_code:
+                return None
+        return code
+
+    def _extend(self, adj : List[int], edges : int, code : int) -> Iterator[List[int]]:
+        k = len(adj)
+        if k == self.n:
+            yield adj
+            return
+        if k == self.split:
+            self.counter += 1
+            if (self.counter - 1) % self.mod != self.res:
+                return
+        seen = set()
+        for S in range(1, 1 << k):
+            size = S.bit_count()
+            if not self._feasible(k + 1, edges + size):
+                continue
+            child = [a | (1 << k) if S >> v & 1 else a for v, a in enumerate(adj)]
+            child.append(S)
+            child_code = self._accept(child, code)
+            if child_code is None or child_code in seen:
+                continue
+            seen.add(child_code)
+            yield from self._extend(child, edges + size, child_code)
+
+    def adjacency(self) -> Iterator[List[int]]:
+        """Streams graphs as lists of adjacency bitmasks."""
+        self.counter = 0
+        if self.n == 1:
+            if self.m in (None, 0) and self.res == 0:
+                yield [0]
+            return
+        yield from self._extend([0], 0, 0)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Streams graphs as (m, 2) edge arrays."""
+        for adj in self.adjacency():
+            yield np.array(
+                [(u, v) for v, a in enumerate(adj) for u in range(v) if a >> u & 1],
+                dtype=np.int64,
+            ).reshape(-1, 2)
+
+    def graph6(self) -> Iterator[str]:
+        for edges in self:
+            yield graph6.encode(self.n, edges)
+
+class CM2Reducer:
+    """Running minimum and maximum of cM2 over batches of graphs.
+
+    A batch is an array of shape (B, m, 2) of B graphs on n vertices with m
+    edges each. At most keep graphs are stored for each extreme."""
+    def __init__(self, keep : int = 1):
+        self.keep = keep
+        self.count = 0
+        self.min : Optional[int] = None
+        self.max : Optional[int] = None
+        self.min_graphs : List[np.ndarray] = []
+        self.max_graphs : List[np.ndarray] = []
+        self.min_count = self.max_count = 0
+
+    @staticmethod
+    def cM2(n : int, batch : np.ndarray) -> np.ndarray:
+        B = batch.shape[0]
+        offset = (np.arange(B) * n)[:, None, None]
+        degree = np.bincount((batch + offset).ravel(), minlength=B * n).reshape(B, n)
+        d = np.take_along_axis(degree, batch.reshape(B, -1), axis=1).reshape(batch.shape)
+        return np.abs(d[:, :, 0]**2 - d[:, :, 1]**2).sum(axis=1)
+
+    def _update(self, which : str, value : int, graphs : List[np.ndarray], count : int):
+        current = getattr(self, which)
+        if current is None or better(which, value, current):
+            setattr(self, which, value)
+            setattr(self, which + '_graphs', graphs[:self.keep])
+            setattr(self, which + '_count', count)
+        elif value == current:
+            stored = getattr(self, which + '_graphs')
+            stored.extend(graphs[:self.keep - len(stored)])
+            setattr(self, which + '_count', getattr(self, which + '_count') + count)
+
+    def feed(self, n : int, batch : np.ndarray) -> None:
+        if len(batch) == 0:
+            return
+        values = self.cM2(n, batch)
+        self.count += len(batch)
+        for which, value in (('min', values.min()), ('max', values.max())):
+            where = np.flatnonzero(values == value)
+            self._update(which, int(value), [batch[i] for i in where[:self.keep]], len(where))
+
+    def merge(self, other : "CM2Reducer") -> None:
+        self.count += other.count
+        for which in ('min', 'max'):
+            value = getattr(other, which)
+            if value is not None:
+                graphs = getattr(other, which + '_graphs')
+                self._update(which, value, graphs, getattr(other, which + '_count'))
+
+def _shard(args) -> CM2Reducer:
+    n, m, res, mod, batch, keep = args
+    reducer, chunk = CM2Reducer(keep), []
+    for edges in ConnectedGraphs(n, m, res, mod):
+        chunk.append(edges)
+        if len(chunk) == batch:
+            reducer.feed(n, np.stack(chunk))
+            chunk = []
+    if chunk:
+        reducer.feed(n, np.stack(chunk))
+    return reducer
+
+def extremes(
+        n : int,
+        v : int,
+        workers : Optional[int] = None,
+        shards : int = 1,
+        batch : int = 4096,
+        keep : int = 1,
+) -> CM2Reducer:
+    """Exhaustive minimum and maximum of cM2 over connected graphs with
+    order n and cyclomatic number v, split into shards on a process pool."""
+    jobs = [(n, n - 1 + v, res, shards, batch, keep) for res in range(shards)]
+    if workers == 1:
+        reducers = list(map(_shard, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            reducers = list(pool.map(_shard, jobs))
+    total = reducers[0]
+    for reducer in reducers[1:]:
+        total.merge(reducer)
+    return total
+
+def verify(n : int, v : int, **kwargs) -> Dict:
+    """Compares exhaustive extremes with values of Conjecture."""
+    from conjecture import Conjecture
+    conjecture = Conjecture()
+    reducer = extremes(n, v, **kwargs)
+    record = {"n": n, "v": v, "graphs": reducer.count}
+    for which in ('min', 'max'):
+        try:
+            expected = getattr(conjecture, which).cM2(n, v)
+        except ValueError:
+            expected = None
+        record[which] = getattr(reducer, which)
+        record[which + "_conjecture"] = expected
+    return record
+
+
+if __name__ == "__main__":
+    from conjecture import Base
+    for n in range(4, 9):
+        for v in range(1, n):
+            if Base.graph_exists(n, v):
+                print(verify(n, v, shards=4))
@@ -0,0 +1,110 @@
+import numpy as np
+from typing import Iterable, Tuple, IO
+
+def _size(n : int) -> bytes:
+    if n < 63:
+        return bytes([n + 63])
+    if n < 258048:
+        return bytes([126] + [(n >> s & 63) + 63 for s in (12, 6, 0)])
+    return bytes([126, 126] + [(n >> s & 63) + 63 for s in (30, 24, 18, 12, 6, 0)])
+
+def _read_size(data : bytes) -> Tuple[int, int]:
+    """Returns order n and number of bytes used to encode it."""
+    if data[0] != 126:
+        return data[0] - 63, 1
+    if data[1] != 126:
+        digits, used = data[1:4], 4
+    else:
+        digits, used = data[2:8], 8
+    n = 0
+    for d in digits:
+        n = (n << 6) | (d - 63)
+    return n, used
+
+def encode(n : int, edges) -> str:
+    """graph6 string of a graph on vertices 0, ..., n-1 with given edges."""
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    i, j = edges.min(axis=1), edges.max(axis=1)
+    bits = np.zeros(-(-n * (n - 1) // 2 // 6) * 6, dtype=np.uint8)
+    bits[j * (j - 1) // 2 + i] = 1
+    data = bits.reshape(-1, 6) @ np.array([32, 16, 8, 4, 2, 1]) + 63
+    return (_size(n) + data.astype(np.uint8).tobytes()).decode("ascii")
+
+def decode(line) -> Tuple[int, np.ndarray]:
+    """Order n and (m, 2) edge array of a graph6 (or sparse6) string, edges
+    have i < j."""
+    data = line.encode("ascii") if isinstance(line, str) else line
+    data = data.strip()
+    if data.startswith(b">>graph6<<"):
+        data = data[10:]
+    if data.startswith((b":", b">>sparse6<<")):
+        return decode_sparse6(data)
+    n, used = _read_size(data)
+    values = np.frombuffer(data[used:], dtype=np.uint8) - 63
+    bits = np.unpackbits(values[:, None], axis=1)[:, 2:].ravel()[:n * (n - 1) // 2]
+    k = np.flatnonzero(bits)
+    j = ((1 + np.sqrt(1 + 8 * k)) // 2).astype(np.int64)
+    j -= j * (j - 1) // 2 > k # guard against rounding of sqrt
+    j += j * (j + 1) // 2 <= k
+    return n, np.stack((k - j * (j - 1) // 2, j), axis=1)
+
+def decode_sparse6(line) -> Tuple[int, np.ndarray]:
+    """Order n and (m, 2) edge array of a sparse6 string, edges have i <= j
+    (loops and multiple edges are kept as given)."""
+    data = line.encode("ascii") if isinstance(line, str) else line
+    data = data.strip()
+    if data.startswith(b">>sparse6<<"):
+        data = data[11:]
+    n, used = _read_size(data[1:])
+    k = (n - 1).bit_length()
+    values = np.frombuffer(data[1 + used:], dtype=np.uint8) - 63
+    bits = np.unpackbits(values[:, None], axis=1)[:, 2:].ravel().tolist()
+    edges, v, p = [], 0, 0
+    while p + 1 + k <= len(bits):
+        b, x = bits[p], 0
+        for bit in bits[p + 1:p + 1 + k]:
+            x = (x << 1) | bit
+        p += 1 + k
+        v += b
+        if x >= n or v >= n: # padding
+            break
+        if x > v:
+            v = x
+        else:
+            edges.append((x, v))
+    return n, np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+def decode_many(lines, n : int) -> np.ndarray:
+    """Edges of graph6 lines (bytes) of graphs of equal order n at once, as
+    an array of shape (B, M, 2) padded with pairs (n, n), M the largest
+    number of edges."""
+    used = len(_size(n))
+    data = np.frombuffer(b"".join(line.strip() for line in lines), dtype=np.uint8)
+    data = data.reshape(len(lines), -1)[:, used:] - 63
+    P = n * (n - 1) // 2
+    bits = np.unpackbits(data[:, :, None], axis=2)[:, :, 2:].reshape(len(lines), -1)[:, :P]
+    j, i = np.tril_indices(n, -1) # order of bits of graph6
+    pairs = np.append(np.stack((i, j), axis=1), [[n, n]], axis=0)
+    m = bits.sum(axis=1, dtype=np.int64)
+    b, k = np.nonzero(bits)
+    position = np.arange(len(k)) - np.repeat(np.cumsum(m) - m, m)
+    index = np.full((len(lines), int(m.max(initial=0))), P)
+    index[b, position] = k
+    return pairs[index]
+
+def write(f : IO[bytes], n : int, columns : Iterable[np.ndarray]) -> None:
+    """Streams graph6 of a graph to a binary file. columns yields, for j = 1, ..., n-1
+    in order, boolean arrays of adjacency of j to 0, ..., j-1 (possibly several
+    columns concatenated), so the whole bit string is never in memory."""
+    f.write(_size(n))
+    weights = np.array([32, 16, 8, 4, 2, 1])
+    carry = np.zeros(0, dtype=np.uint8)
+    for column in columns:
+        bits = np.concatenate((carry, np.asarray(column, dtype=np.uint8)))
+        k = len(bits) // 6 * 6
+        f.write((bits[:k].reshape(-1, 6) @ weights + 63).astype(np.uint8).tobytes())
+        carry = bits[k:]
+    if len(carry):
+        bits = np.concatenate((carry, np.zeros(6 - len(carry), dtype=np.uint8)))
+        f.write(bytes([int(bits @ weights) + 63]))
+    f.write(b"\n")
@@ -0,0 +1,136 @@
+import networkx as nx
+import numpy as np
+from typing import (
+    Optional, List, Tuple, Hashable,
+)
+
+Edge = Tuple[int, int]
+
+class GraphState:
+    """Array backed graph on vertices 0, ..., n-1 for the annealer.
+
+    Adjacency is kept as a bitset (n rows of n bits), together with a degree
+    array and an int32 edge array, and nothing else: neighbours of a vertex
+    are read from its row of bits. Swaps keep the number of edges, so edge
+    uv is replaced by wx in its row, in O(1) given the row, which the
+    callers know from the edge they picked (without it, the row is found by
+    a scan of the edge array).
+
+    Memory of a state is n*ceil(n/8) bytes of bits, 8n of int64 degrees
+    (scores sum their squares), 8m of edges and 8n of label references, so
+    n^2/8 + 16n + 8m bytes in all. It is above n^2/8 by the O(n + m) arrays
+    only: 2.2x at n = 200, m = 300 and 1.4x at n = 1000, m = 1050; dense
+    graphs with m near n^2/2 are dominated by the edge array, which the swap
+    moves and the scorer need as rows. A snapshot is the edge array alone."""
+    __slots__ = (
+        "n", "labels", "bits", "degree", "edges",
+    )
+
+    def __init__(self, n : int, edges, labels : Optional[List[Hashable]] = None):
+        self.n = n
+        self.labels = list(range(n)) if labels is None else labels
+        self.bits = np.zeros((n, (n + 7) // 8), dtype=np.uint8)
+        self.edges = np.array(edges, dtype=np.int32).reshape(-1, 2)
+        u, v = self.edges[:, 0], self.edges[:, 1]
+        np.bitwise_or.at(self.bits, (u, v >> 3), (1 << (v & 7)).astype(np.uint8))
+        np.bitwise_or.at(self.bits, (v, u >> 3), (1 << (u & 7)).astype(np.uint8))
+        self.degree = np.bincount(self.edges.ravel(), minlength=n).astype(np.int64)
+
+    @classmethod
+    def from_networkx(cls, G : nx.Graph) -> "GraphState":
+        labels = list(G)
+        index = {s: i for i, s in enumerate(labels)}
+        return cls(len(labels), [(index[u], index[v]) for u, v in G.edges()], labels)
+
+    def to_networkx(self, edges : Optional[np.ndarray] = None) -> nx.Graph:
+        """Graph with original labels, given by edges (default: current edges)."""
+        edges = self.edges if edges is None else edges
+        G = nx.Graph()
+        G.add_nodes_from(self.labels)
+        G.add_edges_from((self.labels[u], self.labels[v]) for u, v in edges.tolist())
+        return G
+
+    @staticmethod
+    def key(u : int, v : int) -> Edge:
+        return (u, v) if u < v else (v, u)
+
+    def __getitem__(self, uv) -> np.ndarray:
+        """Adjacency of u and v, works elementwise on index arrays."""
+        u, v = uv
+        return (self.bits[u, v >> 3] >> (v & 7)) & 1
+
+    def has_edge(self, u : int, v : int) -> bool:
+        return bool(self[u, v])
+
+    def incident(self, vertices : List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Pairs (k, y) for neighbours y of vertices[k], ordered by k and y.
+        Only the nonzero bytes of the rows of bits are unpacked, so beyond a
+        scan of n/8 bytes per vertex this takes O(degree)."""
+        rows = self.bits[vertices]
+        k, byte = np.nonzero(rows)
+        bits = np.unpackbits(rows[k, byte][:, None], axis=1, bitorder='little')
+        r, b = np.nonzero(bits)
+        return k[r], byte[r] * 8 + b
+
+    def neighbours(self, u : int) -> np.ndarray:
+        """Neighbours of u in increasing order, from its row of bits."""
+        return self.incident([u])[1]
+
+    def adjacency(self) -> List[List[int]]:
+        """Neighbour lists of all vertices at once, built from the edge array."""
+        ends = np.concatenate((self.edges, self.edges[:, ::-1]))
+        ends = ends[np.argsort(ends[:, 0], kind='stable')]
+        bounds = np.searchsorted(ends[:, 0], np.arange(self.n + 1)).tolist()
+        targets = ends[:, 1].tolist()
+        return [targets[bounds[u]:bounds[u + 1]] for u in range(self.n)]
+
+    def row(self, u : int, v : int) -> int:
+        """Row of edge uv in the edge array, by a scan of it in O(m)."""
+        e = self.edges
+        i = np.flatnonzero(((e[:, 0] == u) & (e[:, 1] == v)) | ((e[:, 0] == v) & (e[:, 1] == u)))
+        if len(i) == 0: raise KeyError((u, v))
+        return int(i[0])
+
+    def _link(self, u : int, v : int) -> None:
+        self.bits[u, v >> 3] |= np.uint8(1 << (v & 7))
+        self.bits[v, u >> 3] |= np.uint8(1 << (u & 7))
+        self.degree[u] += 1
+        self.degree[v] += 1
+
+    def _unlink(self, u : int, v : int) -> None:
+        self.bits[u, v >> 3] &= np.uint8(~(1 << (v & 7)) & 0xFF)
+        self.bits[v, u >> 3] &= np.uint8(~(1 << (u & 7)) & 0xFF)
+        self.degree[u] -= 1
+        self.degree[v] -= 1
+
+    def swap(self, uv : Edge, wx : Edge, i : Optional[int] = None) -> None:
+        """Replaces edge uv in row i (found if None) by non-edge wx, in O(1)
+        given i. Undone by swap(wx, uv, i)."""
+        if i is None:
+            i = self.row(*uv)
+        self._unlink(*uv)
+        self._link(*wx)
+        self.edges[i] = wx
+
+    def non_edges(self) -> np.ndarray:
+        """Array of pairs u < v which are not edges."""
+        A = np.unpackbits(self.bits, axis=1, count=self.n, bitorder='little')
+        return np.argwhere(np.triu(A == 0, k=1))
+
+    def snapshot(self) -> np.ndarray:
+        """Copy of the edge array, enough to rebuild the graph (8m bytes)."""
+        return self.edges.copy()
+
+    def is_connected(self) -> bool:
+        neighbours = self.adjacency()
+        seen, stack = {0}, [0]
+        while stack:
+            for y in neighbours[stack.pop()]:
+                if y not in seen:
+                    seen.add(y)
+                    stack.append(y)
+        return len(seen) == self.n
+
+    def cM2(self) -> int:
+        d = self.degree[self.edges]
+        return int(np.abs(d[:, 0]**2 - d[:, 1]**2).sum())
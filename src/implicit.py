@@ -0,0 +1,213 @@
+import networkx as nx
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Iterator, Tuple
+from conjecture import Base, Max
+import graph6
+
+class ImplicitGraph(ABC):
+    """Graph on vertices 0, ..., n-1 with cyclomatic number v, given by a rule
+    instead of adjacency. Subclasses define degrees and neighbours, everything
+    else is computed from them in chunks, so memory stays O(n + chunk)."""
+    def __init__(self, n : int, v : int):
+        self.n, self.v = n, v
+
+    def number_of_edges(self) -> int:
+        return self.n - 1 + self.v
+
+    @abstractmethod
+    def degrees(self) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def neighbours(self, u : int) -> np.ndarray:
+        pass
+
+    def has_edge(self, u : int, w : int) -> bool:
+        return bool(np.any(self.neighbours(u) == w))
+
+    def edge_chunks(self, size : int = 1 << 16) -> Iterator[np.ndarray]:
+        """Edges u < w as (k, 2) arrays of at most about size rows."""
+        chunk, rows = [], 0
+        for u in range(self.n):
+            nb = self.neighbours(u)
+            nb = nb[nb > u]
+            chunk.append(np.stack((np.full(len(nb), u), nb), axis=1))
+            rows += len(nb)
+            if rows >= size:
+                yield np.concatenate(chunk)
+                chunk, rows = [], 0
+        if rows:
+            yield np.concatenate(chunk)
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        for chunk in self.edge_chunks():
+            yield from map(tuple, chunk.tolist())
+
+    def columns(self, size : int = 1 << 16) -> Iterator[np.ndarray]:
+        """Upper triangle of adjacency by columns j = 1, ..., n-1, as needed by
+        graph6, concatenated into chunks of about size bits."""
+        chunk, bits = [], 0
+        for j in range(1, self.n):
+            column = np.zeros(j, dtype=np.uint8)
+            nb = self.neighbours(j)
+            column[nb[nb < j]] = 1
+            chunk.append(column)
+            bits += j
+            if bits >= size:
+                yield np.concatenate(chunk)
+                chunk, bits = [], 0
+        if chunk:
+            yield np.concatenate(chunk)
+
+    def cM2(self) -> int:
+        d = self.degrees()
+        if int(d.max())**2 * self.number_of_edges() >= 2**63:
+            d = d.astype(object)
+        return int(sum(
+            np.abs(d[e[:, 0]]**2 - d[e[:, 1]]**2).sum() for e in self.edge_chunks()
+        ))
+
+    def write_edgelist(self, path : str, size : int = 1 << 16) -> None:
+        with open(path, "w") as f:
+            for chunk in self.edge_chunks(size):
+                np.savetxt(f, chunk, fmt="%d")
+
+    def write_graph6(self, path : str, size : int = 1 << 16) -> None:
+        with open(path, "wb") as f:
+            graph6.write(f, self.n, self.columns(size))
+
+    def to_networkx(self) -> nx.Graph:
+        """Materialised graph, only sensible for small n."""
+        G = nx.Graph()
+        G.add_nodes_from(range(self.n))
+        for chunk in self.edge_chunks():
+            G.add_edges_from(chunk.tolist())
+        return G
+
+class ImplicitMax(ImplicitGraph):
+    """Graph of Max.G. For n >= v + 2 it is K_1 joined with a star on v + 1
+    vertices and n - v - 2 isolated vertices, otherwise K_{2+a} joined with
+    the complement of K_{n-2-a}, plus a star with b leaves among the latter."""
+    def __init__(self, n : int, v : int):
+        assert Base.graph_exists(n, v), "Graph does not exist."
+        super().__init__(n, v)
+        self.star = n >= v + 2
+        if not self.star:
+            self.a, self.b = Max().find_a_b(n, v)
+
+    def degrees(self) -> np.ndarray:
+        n, v = self.n, self.v
+        if self.star:
+            d = np.ones(n, dtype=np.int64)
+            d[1:v+1] = 2
+            d[0], d[n-1] = v + 1, n - 1
+            return d
+        a, b = self.a, self.b
+        d = np.full(n, 2 + a, dtype=np.int64)
+        d[:a+2] = n - 1
+        d[a+2] = 2 + a + b
+        d[a+3:a+3+b] = 3 + a
+        return d
+
+    def neighbours(self, u : int) -> np.ndarray:
+        n, v = self.n, self.v
+        if self.star:
+            if u == n - 1:
+                return np.arange(n - 1)
+            if u == 0:
+                return np.append(np.arange(1, v + 1), n - 1)
+            return np.array([0, n - 1] if u <= v else [n - 1])
+        a, b = self.a, self.b
+        if u < a + 2:
+            return np.delete(np.arange(n), u)
+        high = np.arange(a + 2)
+        if u == a + 2:
+            return np.concatenate((high, np.arange(a + 3, a + 3 + b)))
+        if u < a + 3 + b:
+            return np.append(high, a + 2)
+        return high
+
+    def cM2(self) -> int:
+        """Sum over classes of edges with equal end degrees."""
+        n, v = self.n, self.v
+        if self.star:
+            return (
+                abs((n-1)**2 - (v+1)**2) + v * ((n-1)**2 - 4)
+                + (n-v-2) * ((n-1)**2 - 1) + v * abs((v+1)**2 - 4)
+            )
+        return Max._cM2(n, v, self.a, self.b)
+
+class ImplicitMin(ImplicitGraph):
+    """Graph of Min.G: a cycle for v = 1; for v >= 2 the graph K_4 - e
+    extended by a ladder of v - 3 rungs and a vertex c = 2v-2 of degree 2
+    closing it, with a path hanging from c (for v = 2, paths hang from
+    both vertices of degree 2 of K_4 - e)."""
+    K4_E = {0: [1, 2, 3], 1: [0, 2, 3], 2: [0, 1], 3: [0, 1]}
+
+    def __init__(self, n : int, v : int):
+        assert Base.graph_exists(n, v), "Graph does not exist."
+        if n < 2*v - 1: raise ValueError("Not implemented")
+        super().__init__(n, v)
+
+    def degrees(self) -> np.ndarray:
+        n, v = self.n, self.v
+        if v == 1:
+            return np.full(n, 2, dtype=np.int64)
+        d = np.ones(n, dtype=np.int64)
+        if v == 2:
+            d[:4] = [3, 3, 2, 2]
+            d[2:n-2] += 1
+            return d
+        c = 2*v - 2
+        d[:c] = 3
+        d[c] += 1
+        d[c:n-1] += 1
+        return d
+
+    def edge_chunks(self, size : int = 1 << 16) -> Iterator[np.ndarray]:
+        """Edges of the core, then the hanging paths by slices of size."""
+        n, v = self.n, self.v
+        if v == 1:
+            yield np.array([[0, n - 1]])
+            start, step = 1, 1
+        elif v == 2:
+            yield np.array([[0, 1], [0, 2], [0, 3], [1, 2], [1, 3]])
+            start, step = 4, 2
+        else:
+            c = 2*v - 2
+            rungs = np.arange(2, c - 2)
+            cross = np.arange(4, c - 1, 2)
+            yield np.concatenate((
+                np.array([[0, 1], [0, 2], [0, 3], [1, 2], [1, 3]]),
+                np.stack((rungs, rungs + 2), axis=1),
+                np.stack((cross, cross + 1), axis=1),
+                np.array([[c - 2, c], [c - 1, c]]),
+            ))
+            start, step = c + 1, 1
+        for i in range(start, n, size):
+            w = np.arange(i, min(i + size, n))
+            yield np.stack((w - step, w), axis=1)
+
+    def neighbours(self, u : int) -> np.ndarray:
+        n, v = self.n, self.v
+        if v == 1:
+            return np.array([(u - 1) % n, (u + 1) % n])
+        if v == 2:
+            nb = self.K4_E[u] if u < 4 else [u - 2]
+            return np.array(nb + ([u + 2] if u >= 2 and u + 2 < n else []))
+        c = 2*v - 2
+        if u < 2:
+            return np.array(self.K4_E[u])
+        if u < c:
+            nb = [0, 1] if u < 4 else [u - 2, u ^ 1]
+            return np.array(nb + [u + 2 if u + 2 < c else c])
+        if u == c:
+            return np.array([c - 2, c - 1] + ([c + 1] if c + 1 < n else []))
+        return np.array([u - 1] + ([u + 1] if u + 1 < n else []))
+
+
+if __name__ == "__main__":
+    G = ImplicitMax(20000, 10**6)
+    print(G.number_of_edges(), G.cM2())
+    G.write_graph6("test_max.g6")
@@ -0,0 +1,148 @@
+import networkx as nx
+import numpy as np
+from scipy.optimize import milp, LinearConstraint, Bounds
+from scipy.sparse import coo_matrix
+from time import perf_counter
+from typing import (
+    Optional, Dict, List, Tuple,
+)
+from conjecture import Conjecture, TIME_BUDGET
+from simulated_annealing import SA
+
+class MILP:
+    """Mixed integer linear programs for minimal and maximal cM2 over connected
+    graphs with order n and cyclomatic number v, solved by HiGHS.
+
+    Variables are edge indicators x_ij (i < j), one-hot degrees y_it
+    (t = 1, ..., n-1), edge costs z_ij and flows f_uw on both orientations of
+    every pair. Vertices are ordered by non-increasing degree, which removes
+    most relabelings and makes d_i^2 - d_j^2 >= 0 for i < j, so the absolute
+    value in cM2 needs no extra binaries:
+        min: z_ij >= s_i - s_j - M (1 - x_ij)
+        max: z_ij <= s_i - s_j + M (1 - x_ij),  z_ij <= M x_ij
+    where s_i = sum_t t^2 y_it and M = (n-1)^2 - 1. Connectivity is a single
+    commodity flow: vertex 0 sends one unit to every other vertex along edges."""
+    def __init__(self, n : int, v : int, _type : str = 'min'):
+        self.n, self.v, self.type = n, v, _type
+        self.m = n - 1 + v
+        if not (n >= 2 and v >= 0 and 2*self.m <= n*(n-1)):
+            raise ValueError("Graph does not exist.")
+        self.pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        self.pair_index = {e: k for k, e in enumerate(self.pairs)}
+        N = len(self.pairs)
+        self.x = np.arange(N)
+        self.y = N + np.arange(n * (n - 1)).reshape(n, n - 1)
+        self.z = N + n * (n - 1) + np.arange(N)
+        self.f = 2*N + n * (n - 1) + np.arange(2*N).reshape(N, 2)
+        self.size = 4*N + n * (n - 1)
+
+    def constraints(self) -> List[LinearConstraint]:
+        """Sparse constraint rows, without objective bounds."""
+        n, N = self.n, len(self.pairs)
+        M = (n - 1)**2 - 1
+        t = np.arange(1, n)
+        rows, cols, vals, lower, upper = [], [], [], [], []
+        def row(c, a, lo, hi):
+            k = len(lower)
+            rows.extend([k] * len(c))
+            cols.extend(c)
+            vals.extend(a)
+            lower.append(lo)
+            upper.append(hi)
+        for i in range(n):
+            # one degree, equal to the number of incident edges
+            row(self.y[i], [1] * (n - 1), 1, 1)
+            incident = [self.pair_index[min(i, j), max(i, j)] for j in range(n) if j != i]
+            row(list(self.x[incident]) + list(self.y[i]), [1] * (n - 1) + list(-t), 0, 0)
+            # non-increasing degrees
+            if i + 1 < n:
+                row(list(self.y[i]) + list(self.y[i + 1]), list(t) + list(-t), 0, np.inf)
+        row(self.x, [1] * N, self.m, self.m)
+        for k, (i, j) in enumerate(self.pairs):
+            s = list(self.y[i]) + list(self.y[j])
+            a = list(t**2) + list(-t**2)
+            if self.type == 'min':
+                row([self.z[k], self.x[k]] + s, [1, -M] + [-c for c in a], -M, np.inf)
+            else:
+                row([self.z[k], self.x[k]] + s, [1, M] + [-c for c in a], -np.inf, M)
+                row([self.z[k], self.x[k]], [1, -M], -np.inf, 0)
+            # flow only along edges, in both directions
+            for d in range(2):
+                row([self.f[k, d], self.x[k]], [1, -(n - 1)], -np.inf, 0)
+        for u in range(n):
+            out = [self.f[k, 0] if i == u else self.f[k, 1] for k, (i, j) in enumerate(self.pairs) if u in (i, j)]
+            into = [self.f[k, 1] if i == u else self.f[k, 0] for k, (i, j) in enumerate(self.pairs) if u in (i, j)]
+            supply = n - 1 if u == 0 else -1
+            row(out + into, [1] * len(out) + [-1] * len(into), supply, supply)
+        A = coo_matrix((vals, (rows, cols)), shape=(len(lower), self.size)).tocsr()
+        return [LinearConstraint(A, lower, upper)]
+
+    def incumbent(self, graphs : Optional[List[nx.Graph]] = None) -> Optional[int]:
+        """Best known value: cM2 of given graphs (for example SA results) and
+        of the graphs of Conjecture, which are all feasible."""
+        values = [SA.cM2(G) for G in graphs or []]
+        conjecture = getattr(Conjecture(TIME_BUDGET), self.type)
+        try:
+            values.append(conjecture.cM2(self.n, self.v))
+        except (ValueError, Warning):
+            pass
+        if not values:
+            return None
+        return min(values) if self.type == 'min' else max(values)
+
+    def solve(
+            self,
+            graphs : Optional[List[nx.Graph]] = None,
+            time_limit : Optional[float] = None,
+            verbose : bool = False,
+    ) -> Tuple[Optional[nx.Graph], Optional[int], Dict]:
+        """Returns an optimal graph, its cM2 and solver statistics.
+
+        The objective is bounded by the incumbent, which HiGHS uses to prune
+        its search tree (scipy offers no warm start)."""
+        start = perf_counter()
+        c = np.zeros(self.size)
+        c[self.z] = 1 if self.type == 'min' else -1
+        constraints = self.constraints()
+        bound = self.incumbent(graphs)
+        if bound is not None:
+            objective = np.zeros(self.size)
+            objective[self.z] = 1
+            if self.type == 'min':
+                constraints.append(LinearConstraint(objective, 0, bound))
+            else:
+                constraints.append(LinearConstraint(objective, bound, np.inf))
+        integrality = np.zeros(self.size)
+        integrality[self.x] = integrality[self.y.ravel()] = 1
+        upper = np.full(self.size, np.inf)
+        upper[self.x] = upper[self.y.ravel()] = 1
+        options = {"disp": verbose, "mip_rel_gap": 0}
+        if time_limit is not None:
+            options["time_limit"] = time_limit
+        built = perf_counter()
+        result = milp(
+            c, constraints=constraints, integrality=integrality,
+            bounds=Bounds(0, upper), options=options,
+        )
+        stats = {
+            "status": result.status, "message": result.message,
+            "incumbent": bound, "variables": self.size,
+            "constraints": sum(C.A.shape[0] for C in constraints),
+            "nodes": getattr(result, "mip_node_count", None),
+            "dual_bound": getattr(result, "mip_dual_bound", None),
+            "gap": getattr(result, "mip_gap", None),
+            "build_seconds": built - start, "solve_seconds": perf_counter() - built,
+        }
+        if result.x is None:
+            return (None, None, stats)
+        G = nx.Graph()
+        G.add_nodes_from(range(self.n))
+        G.add_edges_from(e for e, x in zip(self.pairs, result.x[self.x]) if x > 0.5)
+        return (G, SA.cM2(G), stats)
+
+
+if __name__ == "__main__":
+    for _type in ('min', 'max'):
+        for n, v in [(6, 3), (7, 4), (8, 5)]:
+            G, value, stats = MILP(n, v, _type).solve()
+            print(_type, n, v, value, stats)
@@ -0,0 +1,175 @@
+import networkx as nx
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import (
+    Optional, Dict, List, Tuple, Sequence,
+)
+from energy import better
+from graph_state import GraphState
+from simulated_annealing import SA, random_connected_graph
+from state_cache import StateCache, isomorphism_classes
+
+def _chain(args) -> Tuple[np.ndarray, int, Dict]:
+    """Runs one full annealing chain, its randomness depends only on seed."""
+    i, functions, G, n, v, _type, T, u, seed, schedule, stopping, cache = args
+    rng = np.random.default_rng(seed)
+    if G is None:
+        G = random_connected_graph(n, v, rng)
+    cache = None if cache is None else StateCache(cache)
+    sa = SA(functions, G, _type, T, u, seed=rng, cache=cache)
+    start = perf_counter()
+    stopped = sa.anneal(schedule, stopping)
+    stats = {
+        "chain": i, "best_E": sa.best_E, "E": sa.E, "stopped": stopped,
+        "steps": sa.steps, "seconds": perf_counter() - start,
+    }
+    if cache is not None:
+        stats["cache"] = cache.summary()
+    return (sa.best_edges, sa.best_E, stats)
+
+def _segment(args) -> Tuple[np.ndarray, int, np.ndarray, int]:
+    """Runs steps moves of a replica from edges at its fixed temperature.
+    Returns its edges and energy, and the best edges and energy on the way."""
+    functions, n, edges, _type, T, u, seed, steps = args
+    G = nx.empty_graph(n)
+    G.add_edges_from(edges.tolist())
+    sa = SA(functions, G, _type, T, u, seed=seed)
+    for _ in range(steps):
+        sa.step()
+    return (sa.state.snapshot(), sa.E, sa.best_edges, sa.best_E)
+
+class ParallelSA:
+    """Runs many SA chains on a process pool. Chains of multi_start anneal
+    with schedule until a rule of stopping fires (see SA.anneal), with a
+    StateCache of size cache each if cache is given.
+
+    Every chain gets its own child of SeedSequence(seed), so results depend
+    on seed only and not on the number of workers."""
+    def __init__(
+            self,
+            functions,
+            n : int,
+            v : int,
+            _type : str = 'min',
+            T : float = 1000.0,
+            u : float = 0.995,
+            seed : Optional[int] = None,
+            workers : Optional[int] = None,
+            schedule = None,
+            stopping : Optional[List] = None,
+            cache : Optional[int] = None,
+    ):
+        self.functions = functions
+        self.n, self.v = n, v
+        self.type = _type
+        self.T, self.u = T, u
+        self.seed = np.random.SeedSequence(seed)
+        self.workers = workers
+        self.schedule, self.stopping = schedule, stopping
+        self.cache = cache
+
+    def _map(self, fun, jobs : List):
+        if self.workers == 1:
+            return list(map(fun, jobs))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(fun, jobs))
+
+    def multi_start(
+            self, chains : int, G : Optional[nx.Graph] = None,
+    ) -> Tuple[nx.Graph, int, List[Dict]]:
+        """Independent chains, each from G or from its own random graph.
+        Returns best graph, its energy and statistics of every chain, where
+        chains whose best graphs are isomorphic share the number "class"."""
+        seeds = self.seed.spawn(chains)
+        jobs = [
+            (
+                i, self.functions, G, self.n, self.v, self.type, self.T, self.u, seeds[i],
+                self.schedule, self.stopping, self.cache,
+            )
+            for i in range(chains)
+        ]
+        results = self._map(_chain, jobs)
+        best = 0
+        for i, (_, E, _) in enumerate(results):
+            if better(self.type, E, results[best][1]):
+                best = i
+        labels = list(range(self.n)) if G is None else list(G)
+        graphs = [GraphState(self.n, edges, labels).to_networkx() for edges, _, _ in results]
+        for c, (_, _, stats) in zip(isomorphism_classes(graphs), results):
+            stats["class"] = c
+        return (graphs[best], results[best][1], [stats for _, _, stats in results])
+
+    def tempering(
+            self,
+            temperatures : Sequence[float],
+            rounds : int,
+            steps : int,
+            G : Optional[nx.Graph] = None,
+            share_best : bool = True,
+    ) -> Tuple[nx.Graph, int, List[Dict]]:
+        """Replica exchange: one replica per temperature runs steps moves per round,
+        then neighbouring replicas swap temperatures by the Metropolis rule.
+        If share_best, the coldest replica continues from the best graph found
+        so far whenever it is worse than it. Returns best graph, its energy and
+        statistics of every temperature.
+
+        One pool serves all rounds. Replicas are kept here as edge arrays on
+        vertices 0, ..., n-1 with their energy, only these and the temperature
+        go to the workers, and every round of a replica has its own seed."""
+        temperatures = sorted(temperatures)
+        sign = 1 if self.type == 'min' else -1
+        labels = list(range(self.n)) if G is None else list(G)
+        seeds = self.seed.spawn(len(temperatures) + 1)
+        rng = np.random.default_rng(seeds[-1])
+        edges, energies, round_seeds = [], [], []
+        for i in range(len(temperatures)):
+            chain_rng = np.random.default_rng(seeds[i])
+            H = random_connected_graph(self.n, self.v, chain_rng) if G is None else G
+            state = GraphState.from_networkx(H)
+            edges.append(state.edges)
+            energies.append(state.cM2())
+            round_seeds.append(seeds[i].spawn(rounds))
+        best = list(energies)
+        first = min(range(len(energies)), key=lambda i: sign * energies[i])
+        best_edges, best_E = edges[first], energies[first]
+        swaps = np.zeros((2, len(temperatures) - 1), dtype=np.int64)
+        pool = None if self.workers == 1 else ProcessPoolExecutor(max_workers=self.workers)
+        start = perf_counter()
+        try:
+            for r in range(rounds):
+                jobs = [
+                    (self.functions, self.n, edges[i], self.type, T, self.u, round_seeds[i][r], steps)
+                    for i, T in enumerate(temperatures)
+                ]
+                results = list((map if pool is None else pool.map)(_segment, jobs))
+                for i, (replica_edges, E, replica_best_edges, replica_best_E) in enumerate(results):
+                    edges[i], energies[i] = replica_edges, E
+                    if better(self.type, replica_best_E, best[i]):
+                        best[i] = replica_best_E
+                    if better(self.type, replica_best_E, best_E):
+                        best_edges, best_E = replica_best_edges, replica_best_E
+                for i in range(r % 2, len(temperatures) - 1, 2):
+                    swaps[1, i] += 1
+                    a, b = temperatures[i], temperatures[i + 1]
+                    x = sign * (1 / a - 1 / b) * (energies[i] - energies[i + 1])
+                    if x >= 0 or rng.random() < np.exp(x):
+                        swaps[0, i] += 1
+                        edges[i], edges[i + 1] = edges[i + 1], edges[i]
+                        energies[i], energies[i + 1] = energies[i + 1], energies[i]
+                if share_best and better(self.type, best_E, energies[0]):
+                    edges[0], energies[0] = best_edges, best_E
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        seconds = perf_counter() - start
+        stats = [
+            {
+                "T": T, "best_E": best[i], "E": energies[i],
+                "steps": rounds * steps, "seconds": seconds,
+                "swap_rate": float(swaps[0, i] / max(swaps[1, i], 1))
+                if i < len(temperatures) - 1 else None,
+            }
+            for i, T in enumerate(temperatures)
+        ]
+        return (GraphState(self.n, best_edges, labels).to_networkx(), best_E, stats)
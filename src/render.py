@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import networkx as nx
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+from typing import (
+    Optional, Dict, List, Tuple, Iterable,
+)
+from graph_state import GraphState
+from state_cache import invariant_hash, isomorphism
+
+# Same look as Base._save_graph and save_image.
+STYLE = {
+    "figsize": (6, 6), "dpi": 300, "node_color": "black", "node_size": 300,
+    "edge_style": "dotted", "font_size": 12, "font_color": "white",
+    "layout": "spring", "format": "png",
+}
+
+Job = Tuple[List, List[Tuple], str, Optional[str], Dict, str]
+
+def content_hash(nodes : List, edges : List[Tuple], title : Optional[str], style : Dict) -> str:
+    """Hash of everything that determines the image."""
+    data = json.dumps(
+        [sorted(map(str, nodes)), sorted(map(str, edges)), title, sorted(style.items())],
+        default=str,
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+def layout(G : nx.Graph, kind : str, cache : Optional[str] = None) -> Dict:
+    """Node positions. Spring layouts are cached in directory cache, in a
+    directory named by state_cache.invariant_hash with one file per graph of
+    that invariant, holding its edges and positions. A graph isomorphic to a
+    stored one gets its positions through the map of vertices, so isomorphic
+    graphs share one layout whatever their labels. Files are only ever
+    created (atomically), never rewritten, so workers rendering at once do
+    not lose each other's entries."""
+    if kind == "circular":
+        return nx.circular_layout(G)
+    if cache is None:
+        return nx.spring_layout(G, seed=0)
+    state = GraphState.from_networkx(G)
+    directory = os.path.join(cache, invariant_hash(state))
+    names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            entry = json.load(f)
+        sigma = isomorphism(state, GraphState(len(entry["pos"]), entry["edges"]))
+        if sigma is not None:
+            return {u: np.array(entry["pos"][s]) for u, s in zip(state.labels, sigma.tolist())}
+    pos = nx.spring_layout(G, seed=0)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, hashlib.sha1(state.edges.tobytes()).hexdigest() + ".json")
+    with open(path + f".{os.getpid()}.tmp", "w") as f:
+        json.dump({
+            "edges": state.edges.tolist(),
+            "pos": [list(map(float, pos[u])) for u in state.labels],
+        }, f)
+    os.replace(path + f".{os.getpid()}.tmp", path)
+    return pos
+
+def write_svg(G : nx.Graph, pos : Dict, path : str, title : Optional[str], style : Dict) -> None:
+    """Writes nodes, edges and labels as SVG primitives, without matplotlib.
+    The title and labels are escaped as XML text."""
+    size = 100 * style["figsize"][0]
+    radius = (style["node_size"] ** 0.5) / 2 * size / 432 # points on a 6in figure
+    xy = np.array([pos[u] for u in G.nodes()]) if len(G) else np.zeros((0, 2))
+    low, high = (xy.min(axis=0), xy.max(axis=0)) if len(G) else (0, 1)
+    span = np.maximum(high - low, 1e-9)
+    margin = 2 * radius + (30 if title else 0)
+    def point(u):
+        x, y = (np.asarray(pos[u]) - low) / span
+        return margin + x * (size - 2 * margin), size - margin - y * (size - 2 * margin)
+    dash = {"dotted": ' stroke-dasharray="2,3"', "dashed": ' stroke-dasharray="6,4"'}
+    lines = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size:g}" height="{size:g}" viewBox="0 0 {size:g} {size:g}">',
+        '<rect width="100%" height="100%" fill="white"/>',
+    ]
+    if title:
+        lines.append(f'<text x="{size / 2:g}" y="24" text-anchor="middle" font-size="{style["font_size"] * 1.2:g}">{escape(title)}</text>')
+    for u, w in G.edges():
+        (x1, y1), (x2, y2) = point(u), point(w)
+        lines.append(
+            f'<line x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}" stroke="black"{dash.get(style["edge_style"], "")}/>'
+        )
+    for u in G.nodes():
+        x, y = point(u)
+        lines.append(f'<circle cx="{x:.2f}" cy="{y:.2f}" r="{radius:.2f}" fill="{style["node_color"]}"/>')
+        lines.append(
+            f'<text x="{x:.2f}" y="{y:.2f}" text-anchor="middle" dominant-baseline="central" '
+            f'font-size="{style["font_size"]}" fill="{style["font_color"]}">{escape(str(u))}</text>'
+        )
+    lines.append("</svg>")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+_figures : Dict = {}
+
+def _figure(figsize):
+    """One figure per size and process, cleared and reused for every image."""
+    if figsize not in _figures:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _figures[figsize] = plt.figure(figsize=figsize)
+    figure = _figures[figsize]
+    figure.clf()
+    return figure
+
+def _render(job : Job) -> str:
+    nodes, edges, path, title, style, cache = job
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+    pos = layout(G, style["layout"], cache)
+    if style["format"] == "svg":
+        write_svg(G, pos, path, title, style)
+        return path
+    figure = _figure(tuple(style["figsize"]))
+    ax = figure.add_subplot()
+    nx.draw_networkx_nodes(G, pos, ax=ax, node_color=style["node_color"], node_size=style["node_size"])
+    nx.draw_networkx_edges(G, pos, ax=ax, style=style["edge_style"])
+    nx.draw_networkx_labels(G, pos, ax=ax, font_size=style["font_size"], font_color=style["font_color"])
+    if title:
+        ax.set_title(title)
+    ax.set_axis_off()
+    figure.savefig(path, dpi=style["dpi"])
+    return path
+
+class Renderer:
+    """Batch rendering of graph images on a pool of headless workers.
+
+    Images whose graph, title and style did not change since the last run
+    (recorded by content hash in a manifest in cache) are skipped. Keyword
+    arguments override entries of STYLE, format="svg" writes SVG directly."""
+    def __init__(self, cache : str = ".render-cache", workers : Optional[int] = None, **style):
+        self.cache = cache
+        self.workers = workers
+        self.style = {**STYLE, **style}
+        self.manifest_path = os.path.join(cache, "manifest.json")
+
+    def _manifest(self) -> Dict[str, str]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest : Dict[str, str]) -> None:
+        with open(self.manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=0, sort_keys=True)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def render(self, items : Iterable[Tuple[nx.Graph, str, Optional[str]]]) -> Dict[str, int]:
+        """Renders (graph, path, title) items, returns counts of rendered and
+        skipped images."""
+        os.makedirs(self.cache, exist_ok=True)
+        manifest = self._manifest()
+        jobs, hashes, skipped = [], {}, 0
+        for G, path, title in items:
+            nodes, edges = list(G.nodes()), list(G.edges())
+            digest = content_hash(nodes, edges, title, self.style)
+            key = os.path.abspath(path)
+            if manifest.get(key) == digest and os.path.exists(path):
+                skipped += 1
+                continue
+            hashes[key] = digest
+            jobs.append((nodes, edges, path, title, self.style, self.cache))
+        if self.workers == 1 or len(jobs) <= 1:
+            done = list(map(_render, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                done = list(pool.map(_render, jobs, chunksize=max(1, len(jobs) // 32)))
+        for path in done:
+            manifest[os.path.abspath(path)] = hashes[os.path.abspath(path)]
+        self._save_manifest(manifest)
+        return {"rendered": len(done), "skipped": skipped}
+
+def conjecture_items(
+        _type : str,
+        ns : Iterable[int],
+        vs : Iterable[int],
+        directory : str,
+        extension : str = "png",
+):
+    """Graphs of Conjecture for the grid, named as in optimal-graphs. Pairs
+    whose exact search exceeds its time budget are skipped."""
+    from conjecture import Base, Conjecture, TIME_BUDGET
+    conjecture = getattr(Conjecture(TIME_BUDGET), _type)
+    for n in ns:
+        for v in vs:
+            if not Base.graph_exists(n, v):
+                continue
+            try:
+                G, cM2 = conjecture.G(n, v), conjecture.cM2(n, v)
+            except ValueError:
+                continue
+            path = os.path.join(directory, f"{_type}_cM_2_n{n}_k{v}.{extension}")
+            yield G, path, f"{_type} cM_2(n={n}, k={v}) = {cM2}"
+
+def catalog_items(
+        database : str,
+        _type : str,
+        directory : str,
+        extension : str = "png",
+        ns : Optional[Tuple[int, int]] = None,
+        vs : Optional[Tuple[int, int]] = None,
+):
+    """First stored optimum of every key of a catalog.Catalog file, named as
+    in optimal-graphs."""
+    from catalog import Catalog
+    with Catalog(database) as catalog:
+        for r in catalog.query(_type, ns, vs):
+            n, v, E = r["n"], r["v"], r["E"]
+            G = catalog.graphs(_type, n, v)[0]
+            path = os.path.join(directory, f"{_type}_cM_2_n{n}_k{v}.{extension}")
+            yield G, path, f"{_type} cM_2(n={n}, k={v}) = {E}"
+
+
+if __name__ == "__main__":
+    os.makedirs("render-min", exist_ok=True)
+    renderer = Renderer()
+    print(renderer.render(conjecture_items('min', range(5, 15), range(1, 8), "render-min")))
+    os.makedirs("render-max", exist_ok=True)
+    renderer = Renderer(layout="circular")
+    print(renderer.render(conjecture_items('max', range(5, 15), range(1, 15), "render-max")))
@@ -0,0 +1,160 @@
+from time import perf_counter
+from typing import Optional
+
+# Cooling schedules set sa.T after every step, stopping rules decide after
+# every step whether the chain ends. Both get start(sa) before the first
+# step, which resets their state, so one object can serve several chains
+# one after another.
+
+class Geometric:
+    """T <- u T, the schedule SA always used."""
+    def __init__(self, u : Optional[float] = None):
+        self.u = u
+
+    def start(self, sa) -> None:
+        self.factor = sa.u if self.u is None else self.u
+
+    def __call__(self, sa, accepted : bool) -> None:
+        sa.T *= self.factor
+
+class Adaptive(Geometric):
+    """Geometric cooling with the rate steered by the acceptance ratio of the
+    last window steps: T <- u^(r / target) T, so the chain cools faster while
+    it accepts more than target of its moves and slower while it accepts less.
+    The exponent is kept within [1/4, 4]."""
+    def __init__(self, u : Optional[float] = None, target : float = 0.44, window : int = 100):
+        super().__init__(u)
+        self.target, self.window = target, window
+
+    def start(self, sa) -> None:
+        super().start(sa)
+        self.accepted = self.steps = 0
+        self.exponent = 1.0
+
+    def __call__(self, sa, accepted : bool) -> None:
+        self.accepted += accepted
+        self.steps += 1
+        if self.steps == self.window:
+            ratio = self.accepted / self.window
+            self.exponent = min(4.0, max(0.25, ratio / self.target))
+            self.accepted = self.steps = 0
+        sa.T *= self.factor ** self.exponent
+
+class Reheating(Geometric):
+    """Geometric cooling, but when the best energy did not improve for stall
+    steps the temperature is multiplied by reheat (at most times times)."""
+    def __init__(
+            self,
+            u : Optional[float] = None,
+            stall : int = 500,
+            reheat : float = 10.0,
+            times : Optional[int] = 5,
+    ):
+        super().__init__(u)
+        self.stall, self.reheat, self.times = stall, reheat, times
+
+    def start(self, sa) -> None:
+        super().start(sa)
+        self.best_E, self.since, self.reheats = sa.best_E, 0, 0
+
+    def __call__(self, sa, accepted : bool) -> None:
+        sa.T *= self.factor
+        if sa.best_E != self.best_E:
+            self.best_E, self.since = sa.best_E, 0
+            return
+        self.since += 1
+        if self.since >= self.stall and (self.times is None or self.reheats < self.times):
+            sa.T *= self.reheat
+            self.since = 0
+            self.reheats += 1
+
+class Frozen:
+    """Stops when T <= T_min, the stopping rule SA always used."""
+    reason = "frozen"
+
+    def __init__(self, T_min : float = 1.0):
+        self.T_min = T_min
+
+    def start(self, sa) -> None:
+        pass
+
+    def __call__(self, sa) -> bool:
+        return sa.T <= self.T_min
+
+class TimeBudget:
+    """Stops after seconds of wall clock time."""
+    reason = "time"
+
+    def __init__(self, seconds : float):
+        self.seconds = seconds
+
+    def start(self, sa) -> None:
+        self.end = perf_counter() + self.seconds
+
+    def __call__(self, sa) -> bool:
+        return perf_counter() >= self.end
+
+class Stall:
+    """Stops when the best energy did not improve for window steps."""
+    reason = "stall"
+
+    def __init__(self, window : int):
+        self.window = window
+
+    def start(self, sa) -> None:
+        self.best_E, self.since = sa.best_E, 0
+
+    def __call__(self, sa) -> bool:
+        if sa.best_E != self.best_E:
+            self.best_E, self.since = sa.best_E, 0
+            return False
+        self.since += 1
+        return self.since >= self.window
+
+class Target:
+    """Stops as soon as the best energy reaches E (or goes beyond it)."""
+    reason = "target"
+
+    def __init__(self, E : Optional[int]):
+        self.E = E
+
+    @classmethod
+    def conjecture(cls, _type : str, n : int, v : int) -> "Target":
+        """Target at the value of Conjecture. No target (E is None) for min
+        with n < 2v - 1 if the exact search exceeds its time budget."""
+        from conjecture import Conjecture, TIME_BUDGET
+        try:
+            return cls(getattr(Conjecture(TIME_BUDGET), _type).cM2(n, v))
+        except (ValueError, Warning):
+            return cls(None)
+
+    @classmethod
+    def theorem(cls, n : int) -> "Target":
+        """Maximal cM2 over all graphs of order n, for the max problem."""
+        from theorem import Theorem
+        return cls(Theorem().cM2(n))
+
+    def start(self, sa) -> None:
+        pass
+
+    def __call__(self, sa) -> bool:
+        return self.E is not None and not sa.better(self.E, sa.best_E)
+
+def stopping_rules(
+        _type : str,
+        n : int,
+        v : int,
+        target : bool = False,
+        seconds : Optional[float] = None,
+        stall : Optional[int] = None,
+) -> list:
+    """Frozen, plus the optional rules: Target at the value of Conjecture,
+    TimeBudget of seconds and Stall of stall steps."""
+    rules = [Frozen()]
+    if target:
+        rules.append(Target.conjecture(_type, n, v))
+    if seconds is not None:
+        rules.append(TimeBudget(seconds))
+    if stall is not None:
+        rules.append(Stall(stall))
+    return rules
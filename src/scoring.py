@@ -0,0 +1,145 @@
+import numpy as np
+from typing import Optional, Tuple
+
+class SwapScorer:
+    """Scores all swaps (remove uv, add wx) of a graph at once with NumPy.
+
+    Vertices are indices 0, ..., n-1. For a vertex s let S_s(d) be the sum of
+    |(deg s + d)^2 - deg y^2| over neighbours y of s. The change of cM2 is a sum
+    of per-vertex terms S_s(d) - S_s(0) of the four endpoints, corrected on
+    edges between endpoints, minus the term of uv and plus the term of wx.
+    sign is -1 for min problem and 1 for max problem."""
+    def __init__(self, sign : int):
+        self.sign = sign
+
+    @staticmethod
+    def vertex_gains(degree : np.ndarray, edges : np.ndarray) -> np.ndarray:
+        """Array gains[d + 1, s] = S_s(d) - S_s(0) for d in (-1, 0, 1)."""
+        n = len(degree)
+        ends = np.concatenate((edges, edges[:, ::-1]))
+        d_s, d_y = degree[ends[:, 0]], degree[ends[:, 1]]
+        base = np.abs(d_s**2 - d_y**2)
+        gains = np.zeros((3, n), dtype=np.int64)
+        for d in (-1, 1):
+            term = np.abs((d_s + d)**2 - d_y**2) - base
+            gains[d + 1] = np.bincount(ends[:, 0], weights=term, minlength=n)
+        return gains
+
+    @staticmethod
+    def _changes(degree, gains, U, V, W, X, adjacency) -> np.ndarray:
+        """cM2 changes of swaps UV -> WX given elementwise by index arrays
+        of any broadcast shape, also when UV and WX share an end."""
+        slots = (
+            (U, -1 + (U == W) + (U == X)),
+            (V, -1 + (V == W) + (V == X)),
+            (W, 1 - (W == U) - (W == V)),
+            (X, 1 - (X == U) - (X == V)),
+        )
+        old = {i: degree[s]**2 for i, (s, _) in enumerate(slots)}
+        new = {i: (degree[s] + d)**2 for i, (s, d) in enumerate(slots)}
+        change = sum(gains[d + 1, s] for s, d in slots)
+
+        def correction(p, q):
+            """Edge pq was counted from both sides with one stale degree."""
+            return (
+                np.abs(new[p] - new[q]) - np.abs(new[p] - old[q])
+                - np.abs(old[p] - new[q]) + np.abs(old[p] - old[q])
+            )
+        change = change + correction(0, 1)
+        for p, q in ((0, 2), (0, 3), (1, 2), (1, 3)):
+            change = change + adjacency[slots[p][0], slots[q][0]] * correction(p, q)
+        return change - np.abs(new[0] - new[1]) + np.abs(new[2] - new[3])
+
+    @staticmethod
+    def _shared_ends(n : int, U : np.ndarray, non_edges : np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pairs (i, j) with U[i] an end of non_edges[j], from the list of
+        non-edges at every vertex, without scanning all pairs (i, j)."""
+        ends = non_edges.T.ravel()
+        order = np.argsort(ends, kind='stable')
+        start = np.searchsorted(ends[order], np.arange(n + 1))
+        counts = start[U + 1] - start[U]
+        I = np.repeat(np.arange(len(U)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return I, order[np.repeat(start[U], counts) + offsets] % len(non_edges)
+
+    @staticmethod
+    def deltas(
+            degree : np.ndarray,
+            edges : np.ndarray,
+            non_edges : np.ndarray,
+            adjacency,
+            block : int = 1 << 18,
+    ) -> np.ndarray:
+        """Matrix of cM2 changes, entry (i, j) is for swap edges[i] -> non_edges[j].
+        adjacency[p, q] must work elementwise on index arrays, as it does for
+        a boolean matrix or a GraphState.
+
+        If the four ends are distinct, the degrees of u, v drop and those of
+        w, x grow by one, so the change is a term of uv plus a term of wx plus
+        corrections on edges between {u, v} and {w, x}, which are read from
+        rows P[i] over all vertices. Only swaps whose edge and non-edge share
+        an end, at most 2n per edge, are scored by the general formula. The
+        matrix is filled in blocks of about block entries, so temporaries do
+        not grow with |E| x |N|."""
+        degree = np.asarray(degree, dtype=np.int64)
+        n, E, N = len(degree), len(edges), len(non_edges)
+        out = np.zeros((E, N), dtype=np.int64)
+        if E == 0 or N == 0:
+            return out
+        gains = SwapScorer.vertex_gains(degree, edges)
+        U, V = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64)
+        W, X = non_edges[:, 0].astype(np.int64), non_edges[:, 1].astype(np.int64)
+        sq, down, up = degree**2, (degree - 1)**2, (degree + 1)**2
+        # gains of u and v count the edge uv itself with one stale degree each
+        rows = (
+            gains[0, U] + gains[0, V] + np.abs(sq[U] - sq[V])
+            - np.abs(down[U] - sq[V]) - np.abs(sq[U] - down[V])
+        )
+        cols = gains[2, W] + gains[2, X] + np.abs(up[W] - up[X])
+        def cross(S):
+            """Corrections of edges sy for all y, when the degree of s drops
+            and that of y grows (rows for vertices S)."""
+            p, q = S[:, None], slice(None)
+            return (
+                np.abs(down[p] - up[None, q]) - np.abs(down[p] - sq[None, q])
+                - np.abs(sq[p] - up[None, q]) + np.abs(sq[p] - sq[None, q])
+            )
+        vertices = np.arange(n)
+        K = cross(vertices) if n * n <= block else None
+        step = max(1, block // max(N, n))
+        for lo in range(0, E, step):
+            hi = min(E, lo + step)
+            P = np.zeros((hi - lo, n), dtype=np.int64)
+            for S in (U[lo:hi], V[lo:hi]):
+                P += adjacency[S[:, None], vertices[None, :]] * (cross(S) if K is None else K[S])
+            part = out[lo:hi]
+            part += rows[lo:hi, None]
+            part += cols[None, :]
+            part += P[:, W]
+            part += P[:, X]
+        for S in (U, V):
+            I, J = SwapScorer._shared_ends(n, S, non_edges)
+            out[I, J] = SwapScorer._changes(degree, gains, U[I], V[I], W[J], X[J], adjacency)
+        return out
+
+    def weights(
+            self, 
+            deltas : np.ndarray, 
+            T : float, 
+            mask : Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Boltzmann weights exp(sign * delta / T), scaled so that the largest is 1.
+        Swaps outside of mask get weight 0. Works in place on one float
+        array of the shape of deltas."""
+        logits = self.sign * deltas / T
+        if mask is not None:
+            np.copyto(logits, -np.inf, where=~mask)
+        logits -= logits.max()
+        return np.exp(logits, out=logits)
+
+    @staticmethod
+    def sample(weights : np.ndarray, rng : np.random.Generator) -> Tuple[int, ...]:
+        """Draws an index of weights with probability proportional to its weight."""
+        cumulative = np.cumsum(weights, axis=None)
+        i = np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right')
+        return np.unravel_index(min(i, cumulative.size - 1), weights.shape)
@@ -0,0 +1,203 @@
+import math
+import numpy as np
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter_ns
+from typing import (
+    Optional, List, Tuple,
+)
+from graph_state import GraphState
+from connectivity import BridgeOracle
+from scoring import SwapScorer
+from simulated_annealing import SA, Functions
+
+# Arrays of the chain living in shared memory: name -> (shape, dtype) from n and m.
+LAYOUT = {
+    "degree": (lambda n, m: (n,), np.int64),
+    "edges": (lambda n, m: (m, 2), np.int32),
+    "bits": (lambda n, m: (n, (n + 7) // 8), np.uint8),
+    "tin": (lambda n, m: (n,), np.int64),
+    "tout": (lambda n, m: (n,), np.int64),
+    "child": (lambda n, m: (m,), np.int64),
+}
+
+class _Bits:
+    """Elementwise adjacency of a bitset, as GraphState[u, v]."""
+    def __init__(self, bits : np.ndarray):
+        self.bits = bits
+
+    __getitem__ = GraphState.__getitem__
+
+def _views(blocks, n : int, m : int):
+    return {
+        name: np.ndarray(shape(n, m), dtype=dtype, buffer=blocks[name].buf)
+        for name, (shape, dtype) in LAYOUT.items()
+    }
+
+def _shards(n : int, parts : int) -> List[Tuple[int, int]]:
+    """Rows lo, ..., hi-1 of the upper triangle of adjacency for every worker,
+    with about equal numbers of pairs."""
+    pairs = np.cumsum(np.arange(n - 1, -1, -1))
+    cuts = np.searchsorted(pairs, pairs[-1] * np.arange(1, parts) / parts)
+    bounds = [0] + (cuts + 1).tolist() + [n]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _worker(connection, names, n : int, m : int, lo : int, hi : int, sign : int) -> None:
+    """Scores the swaps to non-edges wx with lo <= w < hi. On ("score", T)
+    replies the largest logit and the sum of weights relative to it, on
+    ("pick", r) the swap where the cumulative weight passes r."""
+    blocks = {name: SharedMemory(name=names[name]) for name in LAYOUT}
+    a = _views(blocks, n, m)
+    adjacency = _Bits(a["bits"])
+    cumulative = non_edges = None
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        if message[0] == "pick":
+            k = np.searchsorted(cumulative, message[1], side='right')
+            i, j = np.unravel_index(min(k, cumulative.size - 1), (m, len(non_edges)))
+            connection.send((int(i), *non_edges[j].tolist()))
+            continue
+        T = message[1]
+        A = np.unpackbits(a["bits"][lo:hi], axis=1, count=n, bitorder='little')
+        w, x = np.nonzero(A == 0)
+        w += lo
+        non_edges = np.stack((w, x), axis=1)[x > w]
+        mask = BridgeOracle.valid_mask(a["tin"], a["tout"], a["child"], non_edges)
+        if not mask.any():
+            connection.send((-math.inf, 0.0))
+            continue
+        deltas = SwapScorer.deltas(a["degree"], a["edges"], non_edges, adjacency)
+        logits = np.where(mask, sign * deltas / T, -np.inf)
+        top = logits.max()
+        cumulative = np.cumsum(np.exp(logits - top), axis=None)
+        connection.send((float(top), float(cumulative[-1])))
+    for block in blocks.values():
+        block.close()
+
+class SharedFunctions(Functions):
+    """Plug-in scoring the swap neighbourhood of one chain on a pool of
+    worker processes, for large n.
+
+    Degrees, edges, adjacency bits and bridge arrays of the chain live in
+    shared memory: the arrays of SA.state are replaced by views of it, so
+    the swaps of the chain update them in place and workers read them
+    without copies. Every worker owns a band of rows of the upper triangle
+    of adjacency and scores swaps to its non-edges. It returns its largest
+    logit and sum of weights, the shard is drawn by these sums and the
+    swap within it by a second message, so the Boltzmann draw is exact
+    over the full neighbourhood. A step sends a few numbers each way.
+
+    Workers start on the first step and are stopped by close(); use with a
+    single SA, not with ParallelSA. The cache of SA is not used."""
+    sampled = True
+
+    def __init__(self, workers : int = 2):
+        super().__init__()
+        self.workers = workers
+        self.state : Optional[GraphState] = None
+        self.blocks, self.arrays = {}, {}
+        self.connections, self.processes = [], []
+        self.stale = True
+
+    def attach(self, state : GraphState) -> None:
+        """Moves the arrays of state to shared memory and starts workers."""
+        self.close()
+        n, m = state.n, len(state.edges)
+        self.blocks = {
+            name: SharedMemory(create=True, size=max(1, int(np.prod(shape(n, m))) * np.dtype(dtype).itemsize))
+            for name, (shape, dtype) in LAYOUT.items()
+        }
+        self.arrays = _views(self.blocks, n, m)
+        for name in ("degree", "edges", "bits"):
+            self.arrays[name][...] = getattr(state, name)
+            setattr(state, name, self.arrays[name])
+        names = {name: block.name for name, block in self.blocks.items()}
+        context = mp.get_context()
+        for lo, hi in _shards(n, self.workers):
+            ours, theirs = context.Pipe()
+            process = context.Process(
+                target=_worker, args=(theirs, names, n, m, lo, hi, self.sign), daemon=True,
+            )
+            process.start()
+            self.connections.append(ours)
+            self.processes.append(process)
+        self.state = state
+        self.stale = True
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
+        if self.state is not None: # the chain keeps private copies
+            for name in ("degree", "edges", "bits"):
+                setattr(self.state, name, self.arrays[name].copy())
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks, self.connections, self.processes = {}, [], []
+        self.state = None
+
+    def __enter__(self) -> "SharedFunctions":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def edge_to_remove(self, milp : SA, edges, non_edges):
+        if self.state is not milp.state:
+            self.attach(milp.state)
+        telemetry = milp.telemetry
+        if telemetry is not None: start = perf_counter_ns()
+        bridges = milp.bridges
+        if bridges.dirty or self.stale:
+            bridges.refresh()
+            for name in ("tin", "tout", "child"):
+                self.arrays[name][...] = getattr(bridges, name)
+            self.stale = False
+        if telemetry is not None:
+            scoring = perf_counter_ns()
+            telemetry.timers["connectivity"] += scoring - start
+        for connection in self.connections:
+            connection.send(("score", milp.T))
+        replies = [connection.recv() for connection in self.connections]
+        top = max(t for t, _ in replies)
+        if top == -math.inf: return None
+        mass = np.array([s * math.exp(t - top) for t, s in replies])
+        k, = self.scorer.sample(mass, milp.rng)
+        self.connections[k].send(("pick", milp.rng.random() * replies[k][1]))
+        i, w, x = self.connections[k].recv()
+        if telemetry is not None:
+            telemetry.timers["scoring"] += perf_counter_ns() - scoring
+            telemetry.counters["candidates"] += len(edges) * (self.state.n * (self.state.n - 1) // 2 - len(edges))
+
+        self.pick = (tuple(edges[i].tolist()), (w, x), i)
+        return self.pick[0]
+
+class SharedFunctionsMin(SharedFunctions):
+    sign = -1
+
+class SharedFunctionsMax(SharedFunctions):
+    sign = 1
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from simulated_annealing import FunctionsMin, random_connected_graph
+    n, v, steps = 200, 100, 5
+    G = random_connected_graph(n, v, np.random.default_rng(0))
+    start = perf_counter()
+    sa = SA(FunctionsMin(), G, 'min', 100.0, seed=0)
+    for _ in range(steps):
+        sa.step()
+    print(f"serial: {(perf_counter() - start) / steps * 1e3:.1f} ms/step")
+    for workers in (1, 2, 4):
+        with SharedFunctionsMin(workers) as functions:
+            start = perf_counter()
+            sa = SA(functions, G, 'min', 100.0, seed=0)
+            for _ in range(steps):
+                sa.step()
+            print(f"{workers} workers: {(perf_counter() - start) / steps * 1e3:.1f} ms/step")
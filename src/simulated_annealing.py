@@ -1,9 +1,18 @@
 import networkx as nx 
 from typing import (
-    Optional, Dict, Tuple,
+    Optional, Dict, List, Tuple,
 )
-import random
+import numpy as np
 import math
+import heapq
+from time import perf_counter_ns
+from energy import IncrementalCM2, better
+from graph_state import GraphState, Edge
+from connectivity import BridgeOracle
+from scoring import SwapScorer
+from telemetry import Telemetry
+from schedules import Geometric, Frozen
+from state_cache import StateCache
 
 class SA:
     def __init__(
@@ -14,17 +23,40 @@ class SA:
             T : float = 1000.0, 
             u : float = 0.995, 
             seed : Optional[int] = None,
+            telemetry : Optional[Telemetry] = None,
+            cache : Optional[StateCache] = None,
     ):
         self.functions = functions
+        self.telemetry = telemetry
+        self.cache = cache
         self.type = _type
-        self.G = G.copy()
-        self.E = self.cM2(G)
+        self.restart(GraphState.from_networkx(G))
         self.T = T 
         self.u = u 
-        self.best_state =  G.copy()
+        self.best_edges = self.state.snapshot()
         self.best_E = self.E
         self.seed = seed 
+        self.rng = np.random.default_rng(seed)
+
+    def restart(self, state : GraphState) -> None:
+        """Continues the chain from the given state."""
+        self.state = state
+        self.energy = IncrementalCM2(self.state)
+        self.bridges = BridgeOracle(self.state)
+        self.E = self.energy.value
     
+    @property
+    def G(self) -> nx.Graph:
+        return self.state.to_networkx()
+
+    @property
+    def best_state(self) -> nx.Graph:
+        return self.state.to_networkx(self.best_edges)
+
+    def better(self, E : int, F : int) -> bool:
+        """Whether energy E is strictly better than F."""
+        return better(self.type, E, F)
+
     @staticmethod
     def cM2(G : nx.Graph) -> int: 
         degrees : Dict[int, int] = dict(G.degree()) # type: ignore
@@ -35,112 +67,254 @@ class SA:
 
     def accept(
             self, 
-            state_next : nx.Graph,
+            state_next : GraphState,
             E_state : int, 
             E_next : int
     ) -> bool: 
         change = E_next - E_state
-        if (change < 0 and self.type == 'min') or \
-            (change > 0 and self.type == 'max'):
-            self.best_state = state_next
-            self.best_E = E_next
+        if self.better(E_next, E_state):
+            if self.better(E_next, self.best_E):
+                self.best_edges = state_next.snapshot()
+                self.best_E = E_next
             return True
         return (
-            random.random() < self.functions.cooling_function(change, self)
+            self.rng.random() < self.functions.cooling_function(change, self)
         )
     
-    def new_state(self) -> nx.Graph:
-        edges = list(self.G.edges())
-        non_edges = list(nx.non_edges(self.G))
-        if non_edges == []: return self.G
+    def new_state(self) -> Optional[Tuple[Edge, Edge]]:
+        """Applies a swap to self.state in place, so that it stays connected.
+        Swap is undone by self.energy.rollback()."""
+        edges = self.state.edges
+        non_edges = None if self.functions.sampled else self.state.non_edges()
+        if non_edges is not None and len(non_edges) == 0: return None
         while True: 
-            H = self.G.copy()
             u_v = self.functions.edge_to_remove(self, edges, non_edges)
+            if u_v is None: return None
             w_x = self.functions.edge_to_add(self, edges, non_edges)
-            H.remove_edge(*u_v)
-            H.add_edge(*w_x)
-            if nx.is_connected(H):
-                return H
+            if self.bridges.valid(u_v, w_x):
+                self.energy.apply(u_v, w_x, self.functions.pick[2])
+                return (u_v, w_x)
+            if self.telemetry is not None:
+                self.telemetry.counters["retries"] += 1
             
-    def simulated_annealing(self) -> Tuple[nx.Graph, int]:
-        while self.T > 1:
-            state_next = self.new_state()
-            E_next = self.cM2(state_next)
-            if self.accept(state_next, self.E, E_next):
-                self.G = state_next
+    def step(self) -> bool:
+        """One move at the current temperature, T is not changed.
+        Returns whether a move was accepted."""
+        if self.telemetry is not None:
+            return self._timed_step()
+        swap = self.new_state()
+        if swap is not None:
+            E_next = self.energy.value
+            if self.accept(self.state, self.E, E_next):
+                self.energy.commit()
+                self.bridges.update(*swap)
                 self.E = E_next
-            
-            self.T *= self.u
-        print(
-            f"Best Energy: {self.best_E}\n"
-            f"Edges: {self.best_state.edges()}"
-        )
+                return True
+            self.energy.rollback()
+        return False
+
+    def _timed_step(self) -> bool:
+        """step, recording counters and the accept phase in self.telemetry."""
+        telemetry = self.telemetry
+        best_E = self.best_E
+        accepted = False
+        swap = self.new_state()
+        if swap is None:
+            telemetry.counters["no_move"] += 1
+        else:
+            start = perf_counter_ns()
+            E_next = self.energy.value
+            accepted = self.accept(self.state, self.E, E_next)
+            if accepted:
+                self.energy.commit()
+                self.bridges.update(*swap)
+                self.E = E_next
+            else:
+                self.energy.rollback()
+            telemetry.timers["accept"] += perf_counter_ns() - start
+        telemetry.after_step(self, accepted, self.best_E != best_E)
+        return accepted
+
+    def anneal(self, schedule=None, stopping : Optional[List] = None) -> str:
+        """Steps until one of the stopping rules fires and returns its reason,
+        the number of steps is left in self.steps. Defaults are geometric
+        cooling by u until T <= 1 (see schedules)."""
+        schedule = Geometric() if schedule is None else schedule
+        stopping = [Frozen()] if stopping is None else stopping
+        schedule.start(self)
+        for rule in stopping:
+            rule.start(self)
+        self.steps = 0
+        while True:
+            for rule in stopping:
+                if rule(self):
+                    return rule.reason
+            schedule(self, self.step())
+            self.steps += 1
+
+    def simulated_annealing(
+            self, schedule=None, stopping : Optional[List] = None,
+    ) -> Tuple[nx.Graph, int]:
+        self.stopped = self.anneal(schedule, stopping)
+        if self.telemetry is not None:
+            self.telemetry.finish(self)
         return (self.best_state, self.best_E)
     
     
-class FunctionsMin:
+def random_tree(n : int, rng : np.random.Generator) -> np.ndarray:
+    """Edges of a uniformly random labelled tree on 0, ..., n-1, decoded from
+    a random Pruefer sequence."""
+    if n < 2:
+        return np.zeros((0, 2), dtype=np.int64)
+    prufer = rng.integers(n, size=n - 2).tolist()
+    degree = [1] * n
+    for x in prufer:
+        degree[x] += 1
+    leaves = [s for s in range(n) if degree[s] == 1]
+    heapq.heapify(leaves)
+    edges = []
+    for x in prufer:
+        edges.append((heapq.heappop(leaves), x))
+        degree[x] -= 1
+        if degree[x] == 1:
+            heapq.heappush(leaves, x)
+    edges.append((heapq.heappop(leaves), heapq.heappop(leaves)))
+    return np.array(edges, dtype=np.int64)
+
+def random_connected_graph(n : int, v : int, rng : np.random.Generator) -> nx.Graph:
+    """Random connected graph with order n and cyclomatic number v: a random
+    spanning tree with v distinct random non-edges added, no draw is rejected."""
+    edges = random_tree(n, rng)
+    if v > 0:
+        A = np.zeros((n, n), dtype=bool)
+        A[edges[:, 0], edges[:, 1]] = A[edges[:, 1], edges[:, 0]] = True
+        non_edges = np.argwhere(np.triu(~A, k=1))
+        if v > len(non_edges): raise ValueError("Such graph not possible.")
+        edges = np.concatenate((edges, non_edges[rng.choice(len(non_edges), v, replace=False)]))
+    G = nx.Graph()
+    G.add_nodes_from(range(n))
+    G.add_edges_from(edges.tolist())
+    return G
+
+class Functions:
+    """Plug-in shared by min and max problem. sign is -1 for min, 1 for max.
+    Plug-ins which are sampled get non_edges = None and find swaps themselves.
+    edge_to_remove leaves the swap in pick as (uv, wx, row of uv in edges)."""
+    sign = 0
+    sampled = False
+
     def __init__(self):
         self.pick = None
+        self.scorer = SwapScorer(self.sign)
 
-    @staticmethod
-    def cooling_function(change, milp):
-        return math.exp(- change / milp.T)
+    @classmethod
+    def cooling_function(cls, change, milp):
+        return math.exp(cls.sign * change / milp.T)
     
     @staticmethod
     def cM2(milp, uv, wx):
-        F = milp.G.copy() 
-        F.remove_edge(*uv)
-        F.add_edge(*wx)
-        return milp.cM2(F)
+        return milp.E + milp.energy.delta(uv, wx)
     
     def edge_to_add(self, milp : SA, edges, non_edges):
         if self.pick is None: raise ValueError("Unexpected.")
         return self.pick[1]
     
     def edge_to_remove(self, milp : SA, edges, non_edges):
-        H = milp.G.copy()
-        candidates = [(uv, wx) for uv in edges for wx in non_edges]
-        weights = {
-            (uv, wx) : self.cM2(milp, uv, wx) - milp.E
-            for uv in edges for wx in non_edges
-        }
-        cf_weights = [self.cooling_function(change=weights[(uv, wx)], milp=milp) for (uv, wx) in weights.keys()]
-        pick = random.choices(candidates, weights=cf_weights)[0]
-
-        self.pick = pick
-        return pick[0]
-    
-class FunctionsMax:
-    def __init__(self):
-        self.pick = None
+        state, telemetry = milp.state, milp.telemetry
+        if telemetry is not None: start = perf_counter_ns()
+        if milp.cache is not None:
+            mask, deltas = milp.cache.scores(state, non_edges, lambda: (
+                milp.bridges.mask(non_edges),
+                self.scorer.deltas(state.degree, edges, non_edges, state),
+            ))
+        else:
+            mask = milp.bridges.mask(non_edges)
+        if telemetry is not None:
+            scoring = perf_counter_ns()
+            telemetry.timers["connectivity"] += scoring - start
+        if not mask.any(): return None
+        if milp.cache is None:
+            deltas = self.scorer.deltas(state.degree, edges, non_edges, state)
+        weights = self.scorer.weights(deltas, milp.T, mask)
+        i, j = self.scorer.sample(weights, milp.rng)
+        if telemetry is not None:
+            telemetry.timers["scoring"] += perf_counter_ns() - scoring
+            telemetry.counters["candidates"] += deltas.size
 
-    @staticmethod
-    def cooling_function(change, milp):
-        return math.exp(change / milp.T)
-    
-    @staticmethod
-    def cM2(milp, uv, wx):
-        F = milp.G.copy() 
-        F.remove_edge(*uv)
-        F.add_edge(*wx)
-        return milp.cM2(F)
-    
-    def edge_to_add(self, milp : SA, edges, non_edges):
-        if self.pick is None: raise ValueError("Unexpected.")
-        return self.pick[1]
+        self.pick = (tuple(edges[i].tolist()), tuple(non_edges[j].tolist()), int(i))
+        return self.pick[0]
+
+class FunctionsMin(Functions):
+    sign = -1
     
+class FunctionsMax(Functions):
+    sign = 1
+
+class SparseFunctions(Functions):
+    """Plug-in for large sparse graphs, which never lists the non-edges.
+
+    Every step samples batch swaps, each removing a random edge uv. With
+    probability local, uv is rewired at one end to a vertex at distance two
+    (it slides along a neighbouring edge), otherwise a random pair wx is
+    added. Pairs which are already edges are rejected by the adjacency bits
+    and swaps disconnecting the graph by the bridge oracle, so a batch holds
+    at most batch swaps. These are scored by IncrementalCM2.delta and one is
+    drawn by its Boltzmann weight. Time and memory per step are
+    O(batch * n), neighbours being read from rows of the adjacency bits,
+    independent of n^2. The cache of SA is not used."""
+    sampled = True
+
+    def __init__(self, batch : int = 32, local : float = 0.5):
+        super().__init__()
+        self.batch = batch
+        self.local = local
+
+    def candidates(self, milp : SA) -> List[Tuple[Edge, Edge, int]]:
+        """Valid swaps of a batch as (uv, wx, row of uv in state.edges)."""
+        state, rng, batch = milp.state, milp.rng, self.batch
+        edges = state.edges
+        rows = rng.integers(len(edges), size=batch).tolist()
+        local = (rng.random(batch) < self.local).tolist()
+        side, pick = rng.integers(2, size=batch).tolist(), rng.random(batch).tolist()
+        pairs = rng.integers(state.n, size=(batch, 2)).tolist()
+        swaps = []
+        for k in range(batch):
+            u, v = edges[rows[k]].tolist()
+            if local[k]:
+                w, y = (u, v) if side[k] else (v, u)
+                around = state.neighbours(y)
+                x = int(around[int(pick[k] * len(around))])
+            else:
+                w, x = pairs[k]
+            if w == x or state.has_edge(w, x):
+                continue
+            wx = GraphState.key(w, x)
+            if milp.bridges.valid((u, v), wx):
+                swaps.append(((u, v), wx, rows[k]))
+        return swaps
+
     def edge_to_remove(self, milp : SA, edges, non_edges):
-        H = milp.G.copy()
-        candidates = [(uv, wx) for uv in edges for wx in non_edges]
-        weights = {
-            (uv, wx) : self.cM2(milp, uv, wx) - milp.E
-            for uv in edges for wx in non_edges
-        }
-        cf_weights = [self.cooling_function(change=weights[(uv, wx)], milp=milp) for (uv, wx) in weights.keys()]
-        pick = random.choices(candidates, weights=cf_weights)[0]
-
-        self.pick = pick
-        return pick[0]
+        telemetry = milp.telemetry
+        if telemetry is not None: start = perf_counter_ns()
+        swaps = self.candidates(milp)
+        if telemetry is not None:
+            scoring = perf_counter_ns()
+            telemetry.timers["connectivity"] += scoring - start
+        if not swaps: return None
+        deltas = np.array([milp.energy.delta(uv, wx) for uv, wx, _ in swaps], dtype=np.int64)
+        k, = self.scorer.sample(self.scorer.weights(deltas, milp.T), milp.rng)
+        if telemetry is not None:
+            telemetry.timers["scoring"] += perf_counter_ns() - scoring
+            telemetry.counters["candidates"] += len(swaps)
+
+        self.pick = swaps[k]
+        return self.pick[0]
+
+class SparseFunctionsMin(SparseFunctions):
+    sign = -1
+
+class SparseFunctionsMax(SparseFunctions):
+    sign = 1
     
 def save_image(best_graph, best_cM2, path):
     plt.figure(figsize=(6,6))
@@ -157,6 +331,7 @@ def save_image(best_graph, best_cM2, path):
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
     import math 
+    from telemetry import Reporter
 
     n = 9; k = 3
     m = n - 1 + k 
@@ -167,9 +342,7 @@ if __name__ == "__main__":
     if n < math.ceil((3 + math.sqrt(1 + 8*k)) / 2):
         raise ValueError("Such graph not possible.")
     print("parameters", n, k, m)
-    G = nx.gnm_random_graph(n, m)
-    while not nx.is_connected(G):
-        G = nx.gnm_random_graph(n, m)
+    G = random_connected_graph(n, k, np.random.default_rng())
     print("start")
     sa = SA(
         functions=functions,
@@ -178,6 +351,7 @@ if __name__ == "__main__":
         T=1000000.0,
         u=0.9,
         seed=None,
+        telemetry=Telemetry(callbacks=[Reporter()]),
     )
     print(sa.best_E)
     best_graph, best_cM2 = sa.simulated_annealing()
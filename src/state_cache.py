@@ -0,0 +1,319 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import (
+    Optional, Dict, List, Tuple, Callable, Iterable,
+)
+import networkx as nx
+from graph_state import GraphState
+
+# Fixed random weights of colours in colour refinement, the same in every process.
+_WEIGHTS = np.random.default_rng(0x5EED).integers(1, 2**63, size=4096, dtype=np.uint64)
+
+def _edge_codes(n : int, edges : np.ndarray) -> np.ndarray:
+    edges = edges.astype(np.int64)
+    return edges.min(axis=1) * n + edges.max(axis=1)
+
+# Colour refinements an isomorphism search may run before it gives up.
+REFINEMENTS = 2048
+
+class _Adjacency:
+    """Neighbour lists of a state in one array (targets, grouped by source
+    vertex), so that a round of refinement and the check of a map take O(m)."""
+    __slots__ = ("n", "edges", "codes", "targets", "starts", "nonzero")
+
+    def __init__(self, state : GraphState):
+        self.n = state.n
+        self.edges = state.edges.astype(np.int64)
+        self.codes = np.sort(_edge_codes(self.n, self.edges))
+        ends = np.concatenate((self.edges, self.edges[:, ::-1]))
+        self.targets = ends[np.argsort(ends[:, 0], kind='stable'), 1]
+        self.nonzero = state.degree > 0
+        self.starts = (np.cumsum(state.degree) - state.degree)[self.nonzero]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__[1:])
+
+    def sums(self, values : np.ndarray) -> np.ndarray:
+        """Sum of values over the neighbours of every vertex, modulo 2^64."""
+        out = np.zeros(self.n, dtype=np.uint64)
+        if len(self.targets):
+            out[self.nonzero] = np.add.reduceat(values[self.targets], self.starts)
+        return out
+
+    def maps_to(self, other : "_Adjacency", sigma : np.ndarray) -> bool:
+        """Whether sigma maps the edges of self onto the edges of other."""
+        return np.array_equal(np.sort(_edge_codes(self.n, sigma[self.edges])), other.codes)
+
+def _refine(
+        G : _Adjacency, colour : np.ndarray, target : Optional[bytes] = None,
+) -> Optional[Tuple[np.ndarray, bytes]]:
+    """Colour refinement (1-dimensional Weisfeiler-Lehman) until stable.
+
+    Every round a vertex gets the sum of random weights of its neighbours'
+    colours and the pairs (colour, sum) are renumbered in sorted order, so
+    the numbering does not depend on labels. Returns colours and a record of
+    all rounds, equal for isomorphic graphs with corresponding colours. With
+    a target record, returns None as soon as the record departs from it."""
+    n = G.n
+    weights = _WEIGHTS if n < len(_WEIGHTS) else np.resize(_WEIGHTS, n + 1)
+    colour = colour.astype(np.int64)
+    parts, count, length = [], -1, 0
+    while True:
+        signature = G.sums(weights[colour])
+        order = np.lexsort((signature, colour))
+        c, s = colour[order], signature[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = (c[1:] != c[:-1]) | (s[1:] != s[:-1])
+        keys = np.stack((c[first].astype(np.uint64), s[first]), axis=1)
+        colour = np.empty(n, dtype=np.int64)
+        colour[order] = np.cumsum(first) - 1
+        part = keys.tobytes()
+        if target is not None and target[length:length + len(part)] != part:
+            return None
+        parts.append(part)
+        length += len(part)
+        if len(keys) == count:
+            parts.append(np.bincount(colour).tobytes())
+            return colour, b"".join(parts)
+        count = len(keys)
+
+def _isomorphism(
+        G : _Adjacency, H : _Adjacency, a : np.ndarray, b : np.ndarray, limit : int = REFINEMENTS,
+) -> Optional[np.ndarray]:
+    """Map sigma of the vertices of G onto those of H preserving edges, or
+    None, where a and b are stable colourings of G and H with equal records.
+    A vertex of the first colour class with more than one vertex is given a
+    new colour in G, and so is every vertex of the class in H in turn, then
+    both are refined again. Before that, vertices are simply matched in order
+    within their classes, which already is a map if the classes consist of
+    twins. After limit refinements the search gives up and returns None, so
+    hard pairs (e.g. regular graphs) are taken as not isomorphic."""
+    n = G.n
+    budget = [limit]
+
+    def search(a, b):
+        sigma = np.empty(n, dtype=np.int64)
+        sigma[np.argsort(a, kind='stable')] = np.argsort(b, kind='stable')
+        if G.maps_to(H, sigma):
+            return sigma
+        counts = np.bincount(a)
+        if len(counts) == n:
+            return None
+        c = int(np.argmax(counts > 1))
+        v = int(np.argmax(a == c))
+        a_next, record = _refine(G, np.where(np.arange(n) == v, n, a))
+        for w in np.flatnonzero(b == c).tolist():
+            if budget[0] <= 0:
+                return None
+            budget[0] -= 1
+            found = _refine(H, np.where(np.arange(n) == w, n, b), record)
+            if found is not None and found[1] == record:
+                sigma = search(a_next, found[0])
+                if sigma is not None:
+                    return sigma
+        return None
+    return search(a, b)
+
+def _colouring(state : GraphState) -> Tuple[_Adjacency, np.ndarray, bytes]:
+    """Neighbour lists, stable colouring from degrees and invariant of a state."""
+    G = _Adjacency(state)
+    colour, record = _refine(G, state.degree)
+    return G, colour, np.sort(state.degree).tobytes() + record
+
+def invariant(state : GraphState) -> bytes:
+    """Degree sequence and record of colour refinement from degrees as one
+    byte string. Isomorphic states get equal invariants, the converse holds
+    for almost all graphs, but not e.g. for regular ones."""
+    return _colouring(state)[2]
+
+def invariant_hash(state : GraphState) -> str:
+    """Hex digest of invariant(state), short enough for keys and file names."""
+    return hashlib.sha1(invariant(state)).hexdigest()
+
+def isomorphism(state : GraphState, other : GraphState) -> Optional[np.ndarray]:
+    """Map sigma with other[sigma[v], sigma[w]] == state[v, w], or None if
+    the states are not isomorphic (or the search gave up, see _isomorphism)."""
+    G, a, inv = _colouring(state)
+    H, b, other_inv = _colouring(other)
+    if inv != other_inv:
+        return None
+    return _isomorphism(G, H, a, b)
+
+class _Entry:
+    """Scores of one labelled state: energy, bridge mask and deltas of all
+    swaps of its edges (rows) to its non-edges (columns). Deltas are kept
+    as int32 when they fit, which they do unless degrees are in the tens of
+    thousands."""
+    __slots__ = (
+        "G", "colour", "invariant", "edges", "non_edges", "E", "mask", "deltas",
+    )
+
+    def __init__(self, colouring, edges, non_edges, E, mask, deltas):
+        self.G, self.colour, self.invariant = colouring
+        self.edges, self.non_edges = edges, non_edges
+        small = np.iinfo(np.int32)
+        if deltas.size == 0 or small.min <= deltas.min() and deltas.max() <= small.max:
+            deltas = deltas.astype(np.int32)
+        self.E, self.mask, self.deltas = E, mask, deltas
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.colour, self.edges, self.non_edges, self.mask, self.deltas)
+        return self.G.nbytes + sum(a.nbytes for a in arrays)
+
+    def relabel(self, n : int, sigma : np.ndarray, edges : np.ndarray, non_edges : np.ndarray):
+        """Mask and deltas for a state whose vertex s is vertex sigma[s] here,
+        with rows and columns in the order of its edges and non_edges."""
+        if np.array_equal(sigma[edges], self.edges) and np.array_equal(sigma[non_edges], self.non_edges):
+            return self.mask, self.deltas
+        rows = np.empty(n * n, dtype=np.int64)
+        rows[_edge_codes(n, self.edges)] = np.arange(len(self.edges))
+        cols = np.empty(n * n, dtype=np.int64)
+        cols[_edge_codes(n, self.non_edges)] = np.arange(len(self.non_edges))
+        i = rows[_edge_codes(n, sigma[edges])]
+        j = cols[_edge_codes(n, sigma[non_edges])]
+        return self.mask[np.ix_(i, j)], self.deltas[np.ix_(i, j)]
+
+class StateCache:
+    """Bounded LRU cache of swap scores of graph states, up to isomorphism.
+
+    Entries are keyed by the labelled edge set. A state which is not in the
+    cache is looked up by its invariant (degree sequence and stable colour
+    refinement), and an entry with equal invariant is used only if a map of
+    vertices between them is found, so a hit is always exact. Scores of an isomorphic
+    entry are permuted to the labels of the state and stored under its own
+    key as well. Every entry holds |E| x |N| matrices of deltas and of the
+    bridge mask, so the cache is bounded by maxbytes of entries as well as
+    by maxsize entries; an entry larger than maxbytes is not kept at all.
+
+    Counters: hits (same labelled state), isomorphic (hits up to relabelling),
+    misses, collisions (equal invariants of states not found isomorphic,
+    also when the search gave up) and evictions."""
+    COUNTERS = ("hits", "isomorphic", "misses", "collisions", "evictions")
+
+    def __init__(self, maxsize : int = 128, maxbytes : int = 256 << 20):
+        self.maxsize, self.maxbytes = maxsize, maxbytes
+        self.nbytes = 0
+        self.entries : "OrderedDict[bytes, _Entry]" = OrderedDict()
+        self.classes : Dict[bytes, List[bytes]] = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(state : GraphState) -> bytes:
+        return np.sort(_edge_codes(state.n, state.edges)).tobytes()
+
+    def hit_rate(self) -> float:
+        c = self.counters
+        lookups = c["hits"] + c["isomorphic"] + c["misses"]
+        return (c["hits"] + c["isomorphic"]) / lookups if lookups else 0.0
+
+    def summary(self) -> Dict:
+        return {
+            **self.counters, "size": len(self), "bytes": self.nbytes, "hit_rate": self.hit_rate(),
+        }
+
+    def _insert(self, key : bytes, entry : _Entry) -> None:
+        self.entries[key] = entry
+        self.nbytes += entry.nbytes
+        self.classes.setdefault(entry.invariant, []).append(key)
+        while self.entries and (len(self.entries) > self.maxsize or self.nbytes > self.maxbytes):
+            old_key, old = self.entries.popitem(last=False)
+            self.nbytes -= old.nbytes
+            keys = self.classes[old.invariant]
+            keys.remove(old_key)
+            if not keys:
+                del self.classes[old.invariant]
+            self.counters["evictions"] += 1
+
+    def _isomorphic(self, colouring):
+        """Entry isomorphic to a coloured state with the map of vertices, or
+        None. A found entry becomes the most recently used."""
+        G, colour, inv = colouring
+        keys = self.classes.get(inv)
+        if not keys:
+            return None
+        for other in keys:
+            entry = self.entries[other]
+            sigma = _isomorphism(G, entry.G, colour, entry.colour)
+            if sigma is not None:
+                self.entries.move_to_end(other)
+                return entry, sigma
+        self.counters["collisions"] += 1
+        return None
+
+    def scores(
+            self,
+            state : GraphState,
+            non_edges : np.ndarray,
+            compute : Callable[[], Tuple[np.ndarray, np.ndarray]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Bridge mask and deltas of all swaps of state.edges to non_edges,
+        from the cache or from compute() on a miss."""
+        key = self.key(state)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry.relabel(state.n, np.arange(state.n), state.edges, non_edges)
+        colouring = _colouring(state)
+        found = self._isomorphic(colouring)
+        if found is not None:
+            self.counters["isomorphic"] += 1
+            other, sigma = found
+            mask, deltas = other.relabel(state.n, sigma, state.edges, non_edges)
+            E = other.E
+        else:
+            self.counters["misses"] += 1
+            mask, deltas = compute()
+            E = state.cM2()
+        self._insert(key, _Entry(colouring, state.edges.copy(), non_edges, E, mask, deltas))
+        return mask, deltas
+
+    def cM2(self, state : GraphState) -> int:
+        """cM2 of state, from the cache if some entry is isomorphic to it."""
+        key = self.key(state)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        else:
+            found = self._isomorphic(_colouring(state))
+            if found is None:
+                return state.cM2()
+            entry = found[0]
+        return entry.E
+
+def isomorphism_classes(graphs : Iterable[nx.Graph]) -> List[int]:
+    """Number of the isomorphism class of every graph, classes numbered in
+    order of first appearance. A map of vertices is searched for only between
+    graphs with equal invariants; pairs on which the search gives up are
+    counted as distinct."""
+    classes : Dict[bytes, List[Tuple]] = {}
+    result, count = [], 0
+    for G in graphs:
+        adjacency, colour, inv = _colouring(GraphState.from_networkx(G))
+        group = classes.setdefault(inv, [])
+        for other, other_colour, c in group:
+            if _isomorphism(adjacency, other, colour, other_colour) is not None:
+                result.append(c)
+                break
+        else:
+            group.append((adjacency, colour, count))
+            result.append(count)
+            count += 1
+    return result
+
+def unique(graphs : Iterable[nx.Graph]) -> List[Tuple[nx.Graph, int]]:
+    """Isomorphism classes of graphs, each as (first graph of the class,
+    number of graphs in it), in order of first appearance."""
+    graphs = list(graphs)
+    first : Dict[int, int] = {}
+    counts : Dict[int, int] = {}
+    for i, c in enumerate(isomorphism_classes(graphs)):
+        first.setdefault(c, i)
+        counts[c] = counts.get(c, 0) + 1
+    return [(graphs[first[c]], counts[c]) for c in first]
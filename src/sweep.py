@@ -0,0 +1,163 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import (
+    Optional, Dict, List, Tuple, Iterable,
+)
+from conjecture import Base, Conjecture, TIME_BUDGET
+from simulated_annealing import SA, FunctionsMin, FunctionsMax, random_connected_graph
+from continuation import warm_start
+from schedules import stopping_rules
+from catalog import Catalog
+
+def _job(args) -> Dict:
+    """Runs SA for one pair (n, v) and returns a record of its result. With
+    optima (edges of neighbouring pairs) the chain starts from warm_start."""
+    n, v, _type, T, u, seed, stop, optima = args
+    rng = np.random.default_rng(seed)
+    functions = FunctionsMin() if _type == 'min' else FunctionsMax()
+    start = perf_counter()
+    if optima is None:
+        G, origin = random_connected_graph(n, v, rng), "random"
+    else:
+        G, origin = warm_start(n, v, _type, optima, rng)
+    sa = SA(functions, G, _type, T, u, seed=rng)
+    start_E = sa.E
+    stopped = sa.anneal(stopping=stopping_rules(_type, n, v, **stop))
+    return {
+        "type": _type, "n": n, "v": v, "E": int(sa.best_E),
+        "edges": sa.best_edges.tolist(), "seconds": perf_counter() - start,
+        "steps": sa.steps, "stopped": stopped, "start": origin, "start_E": int(start_E),
+    }
+
+class Sweep:
+    """Runs SA over the grid of orders n and cyclomatic numbers v.
+
+    Every finished job is written to its own JSON file in directory, so an
+    interrupted sweep continues where it stopped. Jobs with the largest n
+    are started first, as they take the longest.
+
+    Besides cooling down, a chain stops when it reaches the value of
+    Conjecture (if target), after seconds or after stall steps without
+    improvement, see schedules.stopping_rules. With catalog (path of a
+    catalog.Catalog), every result is recorded there as well.
+
+    With warm, the grid is run in waves of equal n + v instead, and every
+    chain starts from the best extension of the results for (n - 1, v) and
+    (n, v - 1) (see continuation.warm_start) at temperature T_warm, as it
+    starts close to an optimum already."""
+    def __init__(
+            self,
+            ns : Iterable[int],
+            vs : Iterable[int],
+            _type : str = 'min',
+            directory : str = "sweep",
+            T : float = 1000.0,
+            u : float = 0.995,
+            seed : Optional[int] = None,
+            workers : Optional[int] = None,
+            target : bool = False,
+            seconds : Optional[float] = None,
+            stall : Optional[int] = None,
+            catalog : Optional[str] = None,
+            warm : bool = False,
+            T_warm : float = 10.0,
+    ):
+        self.ns, self.vs = list(ns), list(vs)
+        self.type = _type
+        self.directory = directory
+        self.T, self.u = T, u
+        self.seed = 0 if seed is None else seed
+        self.workers = workers
+        self.stop = {"target": target, "seconds": seconds, "stall": stall}
+        self.catalog = catalog
+        self.warm, self.T_warm = warm, T_warm
+
+    def path(self, n : int, v : int) -> str:
+        return os.path.join(self.directory, f"{self.type}_n{n}_v{v}.json")
+
+    def pairs(self) -> List[Tuple[int, int]]:
+        """All pairs (n, v) for which a graph exists, largest jobs first."""
+        pairs = [
+            (n, v) for n in self.ns for v in self.vs if Base.graph_exists(n, v)
+        ]
+        return sorted(pairs, reverse=True)
+
+    def pending(self) -> List[Tuple[int, int]]:
+        return [(n, v) for n, v in self.pairs() if not os.path.exists(self.path(n, v))]
+
+    def save(self, record : Dict) -> None:
+        """Writes a record atomically, a crash never leaves a partial file."""
+        path = self.path(record["n"], record["v"])
+        with open(path + ".tmp", "w") as f:
+            json.dump(record, f)
+        os.replace(path + ".tmp", path)
+        if self.catalog is not None:
+            with Catalog(self.catalog) as catalog:
+                catalog.record(
+                    self.type, record["n"], record["v"], record["E"], record["edges"],
+                    "sa", self.seed, record["seconds"],
+                )
+
+    def load(self, n : int, v : int) -> Optional[Dict]:
+        if not os.path.exists(self.path(n, v)):
+            return None
+        with open(self.path(n, v)) as f:
+            return json.load(f)
+
+    def job(self, n : int, v : int) -> Tuple:
+        seed = np.random.SeedSequence([self.seed, n, v])
+        if not self.warm:
+            return (n, v, self.type, self.T, self.u, seed, self.stop, None)
+        optima = {}
+        for pair in ((n - 1, v), (n, v - 1)):
+            record = self.load(*pair)
+            if record is not None:
+                optima[pair] = np.array(record["edges"], dtype=np.int64)
+        T = self.T_warm if optima else self.T
+        return (n, v, self.type, T, self.u, seed, self.stop, optima)
+
+    def run(self) -> List[Dict]:
+        """Runs pending jobs and returns records of all finished jobs."""
+        os.makedirs(self.directory, exist_ok=True)
+        if not self.warm:
+            self._run([self.job(n, v) for n, v in self.pending()])
+            return self.results()
+        for wave in sorted({n + v for n, v in self.pending()}):
+            self._run([self.job(n, v) for n, v in self.pending() if n + v == wave])
+        return self.results()
+
+    def _run(self, jobs : List[Tuple]) -> None:
+        if self.workers == 1:
+            for job in jobs:
+                self.save(_job(job))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for future in as_completed([pool.submit(_job, job) for job in jobs]):
+                    self.save(future.result())
+
+    def results(self) -> List[Dict]:
+        records = [self.load(n, v) for n, v in self.pairs()]
+        records = [r for r in records if r is not None]
+        return sorted(records, key=lambda r: (r["n"], r["v"]))
+
+    def summary(self) -> str:
+        """Table comparing SA results with values of Conjecture."""
+        conjecture = getattr(Conjecture(TIME_BUDGET), self.type)
+        lines = ["n\tv\tSA\tconjecture\tmatch"]
+        for r in self.results():
+            try:
+                expected = conjecture.cM2(r["n"], r["v"])
+            except ValueError: # min with n < 2v - 1 not solved within the time budget
+                expected = None
+            match = "-" if expected is None else str(r["E"] == expected)
+            lines.append(f"{r['n']}\t{r['v']}\t{r['E']}\t{expected}\t{match}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    sweep = Sweep(range(5, 13), range(1, 6), _type='min', directory="sweep-min")
+    sweep.run()
+    print(sweep.summary())
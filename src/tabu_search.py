@@ -0,0 +1,134 @@
+import networkx as nx
+import numpy as np
+from typing import (
+    Optional, List, Tuple,
+)
+from energy import IncrementalCM2, better
+from graph_state import GraphState
+from connectivity import BridgeOracle
+
+class TabuSearch:
+    """Tabu search over the edge swap neighbourhood of SA.
+
+    Every step scans all swaps (remove edge uv, add non-edge wx) keeping the
+    graph connected, scored at once by functions.scorer, and makes the best
+    one, even if it is worse than the current graph. Pairs of vertices whose
+    edge was removed or added are tabu for tenure steps: the swap may not
+    touch them again, unless it gives a graph better than the best found so
+    far (aspiration). Ties are broken at random.
+
+    functions is FunctionsMin() or FunctionsMax(), as for SA."""
+    def __init__(
+            self,
+            functions,
+            G : nx.Graph,
+            _type : str = 'min',
+            tenure : Optional[int] = None,
+            seed : Optional[int] = None,
+    ):
+        self.functions = functions
+        self.type = _type
+        self.state = GraphState.from_networkx(G)
+        self.energy = IncrementalCM2(self.state)
+        self.bridges = BridgeOracle(self.state)
+        self.E = self.energy.value
+        self.best_edges = self.state.snapshot()
+        self.best_E = self.E
+        n, m = self.state.n, len(self.state.edges)
+        if tenure is None: # long tabu lists keep sparse min chains off plateaus
+            tenure = max(7, min(m, n * (n - 1) // 2 - m))
+        self.tenure = tenure
+        self.tabu_until = np.zeros(n * n, dtype=np.int64)
+        self.steps = 0
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def G(self) -> nx.Graph:
+        return self.state.to_networkx()
+
+    @property
+    def best_state(self) -> nx.Graph:
+        return self.state.to_networkx(self.best_edges)
+
+    def better(self, E, F):
+        """Whether energy E is strictly better than F, elementwise on arrays."""
+        return better(self.type, E, F)
+
+    def _keys(self, pairs : np.ndarray) -> np.ndarray:
+        pairs = pairs.astype(np.int64)
+        return pairs.min(axis=1) * self.state.n + pairs.max(axis=1)
+
+    def step(self) -> bool:
+        """Makes the best allowed swap. Returns False if there is none."""
+        state = self.state
+        edges, non_edges = state.edges, state.non_edges()
+        if len(non_edges) == 0: return False
+        mask = self.bridges.mask(non_edges)
+        if not mask.any(): return False
+        deltas = self.functions.scorer.deltas(state.degree, edges, non_edges, state)
+        tabu = (
+            (self.tabu_until[self._keys(edges)] > self.steps)[:, None]
+            | (self.tabu_until[self._keys(non_edges)] > self.steps)[None, :]
+        )
+        allowed = mask & (~tabu | self.better(self.E + deltas, self.best_E))
+        if not allowed.any(): # everything tabu, take the best valid swap
+            allowed = mask
+        gain = np.where(allowed, self.functions.sign * deltas, np.iinfo(np.int64).min)
+        best = np.flatnonzero(gain == gain.max())
+        i, j = np.unravel_index(self.rng.choice(best), gain.shape)
+        uv, wx = tuple(edges[i].tolist()), tuple(non_edges[j].tolist())
+        keys = self._keys(np.array([uv, wx]))
+
+        self.energy.apply(uv, wx, int(i))
+        self.energy.commit()
+        self.bridges.update(uv, wx)
+        self.E = self.energy.value
+        self.tabu_until[keys] = self.steps + self.tenure
+        if self.better(self.E, self.best_E):
+            self.best_edges = state.snapshot()
+            self.best_E = self.E
+        self.steps += 1
+        return True
+
+    def search(self, iterations : int = 1000, stopping : Optional[List] = None) -> str:
+        """Steps until iterations are done, no swap is possible or one of the
+        stopping rules (Stall, TimeBudget, Target of schedules) fires.
+        Returns the reason."""
+        stopping = [] if stopping is None else stopping
+        for rule in stopping:
+            rule.start(self)
+        for _ in range(iterations):
+            for rule in stopping:
+                if rule(self):
+                    return rule.reason
+            if not self.step():
+                return "no_move"
+        return "iterations"
+
+    def tabu_search(
+            self, iterations : int = 1000, stopping : Optional[List] = None,
+    ) -> Tuple[nx.Graph, int]:
+        self.stopped = self.search(iterations, stopping)
+        return (self.best_state, self.best_E)
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from conjecture import Conjecture
+    from simulated_annealing import SA, FunctionsMin, FunctionsMax, random_connected_graph
+    from schedules import Stall
+
+    conjecture = Conjecture()
+    print("type\tn\tv\tconjecture\tSA\tseconds\ttabu\tseconds")
+    for _type, pairs in (('max', [(10, 12), (14, 30), (20, 60)]), ('min', [(12, 4), (20, 6)])):
+        for n, v in pairs:
+            functions = FunctionsMin() if _type == 'min' else FunctionsMax()
+            G = random_connected_graph(n, v, np.random.default_rng(0))
+            start = perf_counter()
+            _, E_sa = SA(functions, G, _type, seed=0).simulated_annealing()
+            sa_seconds = perf_counter() - start
+            start = perf_counter()
+            _, E_tabu = TabuSearch(functions, G, _type, seed=0).tabu_search(1000, [Stall(200)])
+            tabu_seconds = perf_counter() - start
+            expected = getattr(conjecture, _type).cM2(n, v)
+            print(f"{_type}\t{n}\t{v}\t{expected}\t{E_sa}\t{sa_seconds:.2f}\t{E_tabu}\t{tabu_seconds:.2f}")
@@ -0,0 +1,105 @@
+import cProfile
+import json
+import numpy as np
+from typing import (
+    Optional, Dict, List, Callable,
+)
+
+class Telemetry:
+    """Counters, phase timers and an energy trace of one SA chain.
+
+    Pass it to SA(..., telemetry=...); without it SA takes its plain code
+    path, so switched off telemetry costs a few comparisons per step.
+    Phases are timed with perf_counter_ns:
+        connectivity  bridge mask of candidate edges to remove (with a
+                      StateCache, the lookup of mask and deltas)
+        scoring       deltas, Boltzmann weights and sampling of a swap
+        accept        acceptance test, commit or rollback
+    The trace is a ring buffer of the last trace rows (step, T, E, best_E).
+    Every every steps each callback is called as callback(sa, telemetry);
+    callbacks with a finish method get finish(sa, telemetry) at the end."""
+    PHASES = ("connectivity", "scoring", "accept")
+    COUNTERS = ("steps", "accepted", "improved", "no_move", "retries", "candidates")
+
+    def __init__(
+            self,
+            trace : int = 4096,
+            callbacks : Optional[List[Callable]] = None,
+            every : int = 1,
+    ):
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.timers = dict.fromkeys(self.PHASES, 0)
+        self.trace = np.zeros((trace, 4))
+        self.callbacks = callbacks or []
+        self.every = every
+
+    def after_step(self, sa, accepted : bool, improved : bool) -> None:
+        c = self.counters
+        c["accepted"] += accepted
+        c["improved"] += improved
+        step = c["steps"]
+        self.trace[step % len(self.trace)] = (step, sa.T, sa.E, sa.best_E)
+        c["steps"] = step + 1
+        if self.callbacks and c["steps"] % self.every == 0:
+            for callback in self.callbacks:
+                callback(sa, self)
+
+    def finish(self, sa) -> None:
+        for callback in self.callbacks:
+            if hasattr(callback, "finish"):
+                callback.finish(sa, self)
+
+    def acceptance_rate(self) -> float:
+        moves = self.counters["steps"] - self.counters["no_move"]
+        return self.counters["accepted"] / moves if moves else 0.0
+
+    def history(self) -> np.ndarray:
+        """Recorded rows of the trace in order of steps."""
+        steps, size = self.counters["steps"], len(self.trace)
+        if steps <= size:
+            return self.trace[:steps].copy()
+        return np.roll(self.trace, -(steps % size), axis=0)
+
+    def summary(self) -> Dict:
+        return {
+            **self.counters,
+            "acceptance_rate": self.acceptance_rate(),
+            "ms": {phase: ns / 1e6 for phase, ns in self.timers.items()},
+        }
+
+    def dump_json(self, path : str, trace : bool = False) -> None:
+        record = self.summary()
+        if trace:
+            record["trace"] = self.history().tolist()
+        with open(path, "w") as f:
+            json.dump(record, f, indent=2)
+
+    @staticmethod
+    def profile(function : Callable, path : Optional[str] = None):
+        """Calls function under cProfile, writes pstats data to path (if given)
+        and returns the result of the call and the profiler."""
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function)
+        if path is not None:
+            profiler.dump_stats(path)
+        return result, profiler
+
+class Reporter:
+    """Opt-in printing for SA: the state every every steps (never if None)
+    and the best energy and edges at the end, as SA used to print."""
+    def __init__(self, every : Optional[int] = None):
+        self.every = every
+
+    def __call__(self, sa, telemetry : Telemetry) -> None:
+        if self.every is not None and telemetry.counters["steps"] % self.every == 0:
+            print(
+                f"step {telemetry.counters['steps']}: T = {sa.T:.4g}, "
+                f"E = {sa.E}, best = {sa.best_E}, "
+                f"acceptance = {telemetry.acceptance_rate():.3f}"
+            )
+
+    def finish(self, sa, telemetry : Telemetry) -> None:
+        print(
+            f"Best Energy: {sa.best_E}\n"
+            f"Edges: {sa.best_state.edges()}"
+        )
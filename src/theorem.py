@@ -1,6 +1,7 @@
 
 from cmath import sqrt, polar, rect, exp
 from math import ceil, floor, pi
+import numpy as np
 
 def cbrt(x):
     r, theta = polar(x) 
@@ -49,6 +50,99 @@ class Theorem:
         return (n/4 - term, n/4 + term)
 
 
+class BatchTheorem:
+    """Array versions of Theorem methods, n (and k) are NumPy arrays.
+
+    Integer results are exact: int64 when the values provably fit into it,
+    otherwise arrays of Python ints (dtype=object). Where both floor(h) and
+    ceil(h) are optimal, gamma returns the smaller one and marks it in a
+    tie mask, instead of returning a tuple."""
+    INT64_MAX = 2**63 - 1
+    STEP_EXACT = 900_000 # _step fits into int64 below this order
+
+    @classmethod
+    def f(cls, n, k):
+        """Complementary second Zagreb index for maximal graphs"""
+        n, k = np.broadcast_arrays(np.asarray(n), np.asarray(k))
+        if n.dtype.kind == 'f' or k.dtype.kind == 'f':
+            n, k = n.astype(float), k.astype(float)
+            return k*(n-k)*((n-1)**2-k**2)
+        if n.size == 0:
+            return np.zeros(n.shape, dtype=np.int64)
+        N, K = int(np.abs(n).max()), int(np.abs(k).max())
+        if K * (N + K) * ((N + 1)**2 + K**2) > cls.INT64_MAX:
+            n, k = n.astype(object), k.astype(object)
+        else:
+            n, k = n.astype(np.int64), k.astype(np.int64)
+        return k*(n-k)*((n-1)**2-k**2)
+
+    @staticmethod
+    def _cbrt(x):
+        return np.abs(x)**(1/3) * np.exp(1j * np.angle(x) / 3)
+
+    @classmethod
+    def relaxed_gamma(cls, n):
+        """Solution of cM2_k(n, k) == 0 over reals"""
+        n = np.asarray(n, dtype=float)
+        cbrt = cls._cbrt
+        xi = 6 * cbrt(-3 + 0j)**2 * (8 + n*(-16 + 11*n))
+        psi = -9 * (n - 2) * n * (3*n - 2) + 4 * np.sqrt(3) * np.sqrt(
+            (-(n - 1)**2 * (32 + n*(-128 + n*(201 + 2*n*(-73 + 34*n))))).astype(complex))
+        return (1/72 * (18*n + xi / cbrt(psi) - 6 * cbrt(-3 + 0j) * cbrt(psi))).real
+
+    @classmethod
+    def _h(cls, n):
+        n = np.asarray(n, dtype=float)
+        A = 9*(n-2)*n*(3*n-2) + 4*np.sqrt(3)*np.sqrt(
+            (-(n-1)**2 * (n*(n*(2*n*(34*n - 73) + 201) - 128) + 32)).astype(complex))
+        B = (16 - 11*n)*n - 8
+        p4 = np.exp(1j * pi / 3)**4
+        h = 1/12 * (3*n - cls._cbrt(3 + 0j) * p4 * cls._cbrt(A) + 3**(2/3)*B/(p4*cls._cbrt(A)))
+        return h.real
+
+    @staticmethod
+    def _step(n, k):
+        """f(n, k+1) - f(n, k), expanded so that its terms are of order n**3."""
+        a = n - 1
+        return a**2*n - a**2*(2*k+1) - n*(3*k**2+3*k+1) + 4*k**3+6*k**2+4*k+1
+
+    @classmethod
+    def gamma(cls, n):
+        """By theorem. Returns optimal k and a mask where k + 1 is optimal as well."""
+        n = np.asarray(n, dtype=np.int64)
+        h = cls._h(n)
+        lo, hi = np.floor(h).astype(np.int64), np.ceil(h).astype(np.int64)
+        small = n < cls.STEP_EXACT
+        diff = np.where(small, cls._step(np.where(small, n, 0), lo), 0).astype(float)
+        if not small.all():
+            N = n.astype(float)
+            diff = np.where(small, diff, cls._step(N, lo.astype(float)))
+            close = ~small & (np.abs(diff) <= 1e-12 * N**3)
+            for i in zip(*np.nonzero(close)): # near ties are decided exactly
+                diff[i] = cls._step(int(n[i]), int(lo[i]))
+        diff = np.where(hi > lo, diff, 0)
+        k = np.where(diff > 0, hi, lo)
+        return k, (diff == 0) & (hi != lo)
+
+    tuple_gamma = gamma
+
+    @classmethod
+    def cM2(cls, n):
+        return cls.f(n, cls.gamma(n)[0])
+
+    @staticmethod
+    def cyclomatic_number_of(n, k):
+        n, k = np.asarray(n, dtype=np.int64), np.asarray(k, dtype=np.int64)
+        return k*(n-k) + k*(k-1)//2 - n + 1
+
+    @staticmethod
+    def concave_on(n):
+        """Interval on which cM2, for maximal graphs, is convex."""
+        n = np.asarray(n, dtype=float)
+        term = np.sqrt(11*n**2 - 16*n + 8) / (4 * np.sqrt(3))
+        return (n/4 - term, n/4 + term)
+
+
 if __name__ == "__main__":
 
     def latex_table(m, n, cols=5, space="0.5cm"):
@@ -76,8 +170,9 @@ if __name__ == "__main__":
         print(r"\end{tabular}")
 
 
-    theorem = Theorem()
-    print([(n, theorem.tuple_gamma(n)[0], theorem.cM2(n)) for n in range(5, 250)])
+    ns = np.arange(5, 250)
+    ks, ties = BatchTheorem.gamma(ns)
+    print(list(zip(ns.tolist(), ks.tolist(), BatchTheorem.f(ns, ks).tolist())))
 
 ##### There exist orders n of G, giving two solutions for k,
 # such orders n are: [12, 117, 450, 4674, 48620, 505829, 1955714, 20347010, ...]
@@ -0,0 +1,179 @@
+import numpy as np
+from typing import (
+    Optional, Dict, Tuple, Iterator, TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# A threshold graph is built from vertex 0 by adding vertices 1, ..., n-1,
+# each either isolated (0) or dominating (1, joined to all earlier vertices).
+# Sequences are boolean arrays of length n with seq[0] = 0, the graph is
+# connected iff seq[n-1] = 1. Dominating vertices form a clique, isolated ones
+# an independent set, and isolated i is adjacent to dominating j iff i < j.
+#
+# With K dominating vertices, a the number of isolated and b the number of
+# dominating vertices before a vertex, a dominating vertex has degree
+# K - 1 + a and an isolated one K - b. The later end of every edge has the
+# larger degree, so
+#     cM2 = sum over dominating of (a + 2b - K + 1) (K - 1 + a)^2
+#         - sum over isolated of (K - b)^3,
+# and the number of edges is the sum of a + b over dominating vertices.
+
+def degrees(seq : np.ndarray) -> np.ndarray:
+    """Degrees of a batch of creation sequences (rows)."""
+    s = np.atleast_2d(np.asarray(seq, dtype=np.int64))
+    later = s[:, ::-1].cumsum(axis=1)[:, ::-1] - s
+    return s * np.arange(s.shape[1]) + later
+
+def edge_count(seq : np.ndarray) -> np.ndarray:
+    s = np.atleast_2d(np.asarray(seq, dtype=np.int64))
+    return s @ np.arange(s.shape[1])
+
+def cM2(seq : np.ndarray) -> np.ndarray:
+    """cM2 of a batch of creation sequences (rows), in O(n) per sequence."""
+    s = np.atleast_2d(np.asarray(seq, dtype=np.int64))
+    b = np.cumsum(s, axis=1) - s
+    a = np.arange(s.shape[1]) - b
+    K = s.sum(axis=1, keepdims=True)
+    dominating = (a + 2*b - K + 1) * (K - 1 + a)**2
+    return np.where(s == 1, dominating, -(K - b)**3).sum(axis=1)
+
+def _subsets(k : int, rest : int) -> Iterator[list]:
+    """Sets of distinct integers in 1, ..., k summing to rest, largest first.
+    A branch stops as soon as the remaining integers cannot reach the sum."""
+    if rest == 0:
+        yield []
+        return
+    for j in range(min(k, rest), 0, -1):
+        if j * (j + 1) // 2 < rest:
+            break
+        for tail in _subsets(j - 1, rest - j):
+            yield [j] + tail
+
+def creation_sequences(n : int, m : int, batch : int = 4096) -> Iterator[np.ndarray]:
+    """All connected threshold graphs of order n with m edges, as batches of
+    creation sequences. The dominating vertices are a set of indices in
+    1, ..., n-1 containing n-1 and summing to m."""
+    if n < 2 or not n - 1 <= m <= n * (n - 1) // 2:
+        return
+    rows = np.zeros((batch, n), dtype=bool)
+    count = 0
+    for chosen in _subsets(n - 2, m - (n - 1)):
+        rows[count, chosen + [n - 1]] = True
+        count += 1
+        if count == batch:
+            yield rows
+            rows = np.zeros((batch, n), dtype=bool)
+            count = 0
+    if count:
+        yield rows[:count]
+
+class ThresholdSearch:
+    """Maximal cM2 over connected threshold graphs of order n, for every
+    number of edges at once.
+
+    Dynamic programming over the creation sequence for every number K of
+    dominating vertices: the state after a prefix is (a, b) with a vector
+    over the number of edges so far, as the gains in the formula above
+    depend only on a, b and K. Vertex 0 is isolated and the last vertex
+    dominating. That is O(n^3) vector operations of length O(n^2)."""
+    def __init__(self, n : int):
+        self.n = n
+        self.M = n * (n - 1) // 2
+        self.best : Optional[np.ndarray] = None
+        self.K : Optional[np.ndarray] = None
+
+    NONE = np.iinfo(np.int64).min // 4
+
+    def _table(self, K : int) -> Dict[Tuple[int, int], np.ndarray]:
+        """Best cM2 sum for every prefix state (a, b) and number of edges,
+        before the last vertex, which is dominating."""
+        n, M = self.n, self.M
+        table = {}
+        start = np.full(M + 1, self.NONE, dtype=np.int64)
+        start[0] = -K**3
+        table[1, 0] = start
+        for p in range(2, n):
+            for b in range(max(0, p - (n - K)), min(K - 1, p - 1) + 1):
+                a = p - b
+                value = np.full(M + 1, self.NONE, dtype=np.int64)
+                if (a - 1, b) in table:
+                    value = np.maximum(value, table[a - 1, b] - (K - b)**3)
+                if b > 0 and (a, b - 1) in table:
+                    before = table[a, b - 1]
+                    e = a + b - 1
+                    gain = (a + 2*(b - 1) - K + 1) * (K - 1 + a)**2
+                    value[e:] = np.maximum(value[e:], before[:M + 1 - e] + gain)
+                table[a, b] = value
+        return table
+
+    def _final(self, K : int, table) -> np.ndarray:
+        n, M = self.n, self.M
+        a, b = n - K, K - 1
+        value = np.full(M + 1, self.NONE, dtype=np.int64)
+        if (a, b) in table:
+            gain = (a + 2*b - K + 1) * (K - 1 + a)**2
+            value[n - 1:] = table[a, b][:M + 2 - n] + gain
+        return value
+
+    def solve(self) -> np.ndarray:
+        """Array of maximal cM2 indexed by the number of edges, below NONE // 2
+        where there is no connected threshold graph."""
+        if self.best is None:
+            self.best = np.full(self.M + 1, self.NONE, dtype=np.int64)
+            self.K = np.zeros(self.M + 1, dtype=np.int64)
+            for K in range(1, self.n):
+                value = self._final(K, self._table(K))
+                better = value > self.best
+                self.best[better], self.K[better] = value[better], K
+        return self.best
+
+    def cM2(self, v : int) -> Optional[int]:
+        m = self.n - 1 + v
+        if not 0 <= m <= self.M:
+            return None
+        value = self.solve()[m]
+        return None if value <= self.NONE // 2 else int(value)
+
+    def sequence(self, v : int) -> np.ndarray:
+        """Creation sequence of a maximal threshold graph with cyclomatic number v."""
+        m = self.n - 1 + v
+        value = self.cM2(v)
+        if value is None: raise ValueError("No connected threshold graph.")
+        K = int(self.K[m])
+        table = self._table(K)
+        seq = np.zeros(self.n, dtype=bool)
+        seq[-1] = True
+        a, b = self.n - K, K - 1
+        target = value - (a + 2*b - K + 1) * (K - 1 + a)**2
+        e = m - (self.n - 1)
+        while a + b > 1:
+            if (a - 1, b) in table and table[a - 1, b][e] == target + (K - b)**3:
+                a, target = a - 1, target + (K - b)**3
+                continue
+            b -= 1
+            e -= a + b
+            target -= (a + 2*b - K + 1) * (K - 1 + a)**2
+            seq[a + b] = True
+        return seq
+
+    def G(self, v : int) -> "nx.Graph":
+        import networkx as nx
+        seq = self.sequence(v)
+        G = nx.empty_graph(self.n)
+        G.add_edges_from((i, j) for j in np.flatnonzero(seq).tolist() for i in range(j))
+        return G
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+    from conjecture import Max
+    for n in (10, 20, 30, 40):
+        start = perf_counter()
+        search = ThresholdSearch(n)
+        search.solve()
+        seconds = perf_counter() - start
+        vs = range(1, search.M - n + 2)
+        match = all(search.cM2(v) == Max().cM2(n, v) for v in vs)
+        print(f"n = {n}: {len(vs)} values in {seconds:.2f} s, equal to Max.cM2: {match}")